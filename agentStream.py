@@ -0,0 +1,67 @@
+import time
+from typing import AsyncIterator
+from langchain_core.messages import AIMessage, ToolMessage
+
+# Node sinh câu trả lời; token của node khác (vd. summarizer tag "nostream") bị bỏ qua
+AGENT_NODE = "our_agent"
+
+
+def chunk_text(chunk) -> str:
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+async def stream_turn_events(app, state: dict) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Chạy một lượt của graph và yield các event (tên, data):
+
+        ("token", {"text"})             token của node agent ngay khi model sinh ra
+        ("tool_call", {"names"})        model gọi tool
+        ("tool_error", {"name"})        tool trả về lỗi
+        ("message", {"text"})           câu trả lời không được stream (in cả message)
+        ("done", {"state", "ttft_ms", "total_ms"})
+
+    "messages" cho token, "values" cho state đầy đủ sau mỗi bước; state trong
+    event "done" là snapshot cuối nên mỗi message (theo id) chỉ có một lần,
+    kể cả message đã bị evict bằng RemoveMessage.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    seen_ids = {m.id for m in state["messages"] if m.id}
+    streamed_ids = set()
+    final = None
+
+    async for mode, payload in app.astream(state, stream_mode=["messages", "values"]):
+        if mode == "messages":
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") != AGENT_NODE:
+                continue
+            text = chunk_text(chunk)
+            if not text:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            streamed_ids.add(chunk.id)
+            yield "token", {"text": text}
+            continue
+
+        final = payload
+        for message in payload["messages"]:
+            if message.id in seen_ids:
+                continue
+            seen_ids.add(message.id)
+            if isinstance(message, AIMessage):
+                if message.tool_calls:
+                    yield "tool_call", {"names": [call["name"] for call in message.tool_calls]}
+                elif message.id not in streamed_ids and message.content:
+                    yield "message", {"text": chunk_text(message)}
+            elif isinstance(message, ToolMessage) and message.status == "error":
+                yield "tool_error", {"name": message.name}
+
+    yield "done", {
+        "state": {**state, **final} if final else state,
+        "ttft_ms": round((first_token_at - start) * 1000, 1) if first_token_at else None,
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
@@ -1,80 +1,154 @@
+import asyncio
+import logging
 from typing import Annotated, Sequence, TypedDict
 from dotenv import load_dotenv  
-from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.messages import BaseMessage, RemoveMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph.message import add_messages
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from mcpserver.mcp_client import MCPClient
+from mcpserver.mcp_registry import MCPRegistry
 import os
 from pathlib import Path
 from tools.toolsManager import ToolManager
+from tools.toolExecutor import ToolExecutor
+from tools.toolRouter import ToolRouter
+from tools.toolCache import ToolResultCache
+from tools.schemaCompiler import ToolMetadataCache, server_fingerprint
 from instruction.instructionManager import InstructionManager
-from tools.updateUserFact import update_user_fact, query_user_fact
-from util import load_state, save_state
+from tools.updateUserFact import update_user_fact, query_user_fact, update_user_facts, query_user_fact_many, warm_up, embed_texts
+from util import load_state, save_state, save_state_fields
+from contextBuilder import ContextBuilder, CONTEXT_TOKEN_BUDGET
+from compactor import ConversationCompactor
    
 
 load_dotenv()   
 
 GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
-SERVER_PATH=os.getenv("SERVER_PATH")
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "1") == "1"
 INSTRUCTION_PATH = Path("instruction/users")
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     system_prompt: SystemMessage
     summary: str
-    recent_window: int 
+    summary_levels: list[list[str]]
+    session_id: str
+    token_budget: int
     
 async def build_ai_agent():
-    client = MCPClient()
+    client = MCPRegistry()
     instruction_manager = InstructionManager()
-    await client.connect_to_server(SERVER_PATH)
-
-    tools_meta = await client.fetch_tools()
-    tool_manager = ToolManager(client)
-    
-    tool_manager.register(update_user_fact)
-    tool_manager.register(query_user_fact)
-
-    await tool_manager.load_from_mcp(tools_meta)
-
-    wrapped_tools = tool_manager.list_tools()
-
-    model = ChatGoogleGenerativeAI(
+    # Load embedding model / Chroma song song với handshake MCP server
+    warmup_task = asyncio.create_task(warm_up()) if EMBEDDING_WARMUP else None
+    # Có metadata đã lưu thì dựng toolset ngay và phục vụ trong lúc handshake MCP
+    # đang chạy; list_tools thật được so lại ở background và thay toolset nếu khác
+    metadata_cache = ToolMetadataCache()
+    fingerprint = server_fingerprint(client.servers)
+    connect_task = asyncio.create_task(client.connect_to_server())
+
+    # Một cache kết quả tool cho cả process, giữ nguyên khi toolset được thay
+    tool_cache = ToolResultCache()
+
+    async def build_tools(tools_meta):
+        tool_manager = ToolManager(client, cache=tool_cache)
+
+        tool_manager.register(update_user_fact)
+        tool_manager.register(query_user_fact)
+        tool_manager.register(update_user_facts)
+        tool_manager.register(query_user_fact_many)
+
+        await tool_manager.load_from_mcp(tools_meta)
+        return tool_manager.list_tools()
+
+    tools_meta = metadata_cache.load(fingerprint)
+    revalidate = tools_meta is not None
+    if not revalidate:
+        await connect_task
+        tools_meta = await client.fetch_tools()
+        metadata_cache.save(fingerprint, tools_meta)
+    wrapped_tools = await build_tools(tools_meta)
+
+    base_model = ChatGoogleGenerativeAI(
         model="gemini-2.0-flash", google_api_key=GEMINI_API_KEY
-    ).bind_tools(wrapped_tools)
+    )
+    # Mỗi lượt chỉ bind các tool liên quan tới câu hỏi (+ tool pinned)
+    # Chỉ tool MCP có dòng mô tả trong system prompt, tool local thì không
+    router = ToolRouter(base_model, wrapped_tools, embed_texts, prompt_tools=[tool["name"] for tool in tools_meta])
+    executor = ToolExecutor(wrapped_tools)
+    # Summary nén xong được ghi ngay vào state store của session, không chờ lượt sau
+    compactor = ConversationCompactor(
+        base_model,
+        on_update=lambda session_id, summary, levels: save_state_fields(
+            session_id, {"summary": summary, "summary_levels": levels}
+        ),
+    )
+
+    if warmup_task:
+        await warmup_task
 
     initial_state = {
         "messages": [], 
         "system_prompt": await instruction_manager.load_system_instructions(tools_meta) ,
         "summary":"",
-        "recent_window": 20
+        "summary_levels": [],
+        "session_id": "default",
+        "token_budget": CONTEXT_TOKEN_BUDGET,
     }
     
     initial_state = load_state(initial_state)
+    context_builder = ContextBuilder()
+
+    async def refresh_tools():
+        nonlocal tools_meta
+        try:
+            await connect_task
+            fresh_meta = await client.fetch_tools()
+        except Exception:
+            logging.exception("MCP connection failed, MCP tool calls will fail")
+            client.ready.set()  # lời gọi đang chờ nhận lỗi ngay thay vì chờ tới timeout
+            return
+        if fresh_meta != tools_meta:
+            logging.info("MCP tools changed since the last run, swapping the toolset")
+            tools = await build_tools(fresh_meta)
+            router.set_tools(tools, [tool["name"] for tool in fresh_meta])
+            executor.set_tools(tools)
+            tools_meta = fresh_meta
+            metadata_cache.save(fingerprint, fresh_meta)
+
+    refresh_task = asyncio.create_task(refresh_tools()) if revalidate else None
+    compactor.seed(initial_state["session_id"], initial_state.get("summary_levels"))
 
     async def model_call(state: AgentState) -> AgentState:
-        recent = state["messages"][-state.get("recent_window", 20):] 
-        
-        prompt_messages = [state["system_prompt"]]
-        if state.get("summary"):
-            prompt_messages.append(SystemMessage(content=f"Summary so far: {state['summary']}"))
-            
-        prompt_messages.extend(recent)
-
-        response = await model.ainvoke(prompt_messages)
-        state["messages"].append(response)
-
-        if len(state["messages"]) > state.get("recent_window", 20):
-            old = state["messages"][:-state["recent_window"]]
-            summary_text = "\n".join([m.content for m in old])
-            state["summary"] = (state.get("summary", "") + "\n" + summary_text).strip()
-            state["messages"] = state["messages"][-state["recent_window"]:]
-
-        save_state(state)
-
-        return state
+        tool_names = await router.select(state["messages"])
+        # Prompt được cache, chỉ build lại khi YAML, sở thích của user hoặc tập tool thay đổi
+        selected_meta = [tool for tool in tools_meta if tool["name"] in tool_names]
+        prefix = [await instruction_manager.system_prompt(selected_meta)]
+        # Lấy từ compactor: summary trong state có thể chưa gồm đợt nén vừa xong
+        session_id = state.get("session_id", "default")
+        summary = compactor.summary(session_id)
+        if summary:
+            prefix.append(SystemMessage(content=f"Summary so far: {summary}"))
+
+        # Message không vừa budget bị evict khỏi history: prompt và history khớp nhau
+        prompt_messages, evicted = context_builder.split(
+            state["messages"], prefix=prefix, token_budget=state.get("token_budget")
+        )
+
+        response = await router.bind(tool_names).ainvoke(prompt_messages)
+
+        # Lượt cũ bị evict được nén ở background, summary mới được lưu khi nén xong
+        if evicted:
+            compactor.submit(session_id, evicted)
+        kept = [*state["messages"][len(evicted):], response]
+
+        update = {
+            "messages": [response, *[RemoveMessage(id=m.id) for m in evicted]],
+            "summary": compactor.summary(session_id),
+            "summary_levels": compactor.levels(session_id),
+        }
+        save_state({**state, **update, "messages": kept})
+
+        return update
 
     def should_continue(state: AgentState): 
         last_message = state["messages"][-1]
@@ -84,7 +158,7 @@ async def build_ai_agent():
 
     graph = StateGraph(AgentState)
     graph.add_node("our_agent", model_call)
-    graph.add_node("tools", ToolNode(tools=wrapped_tools))
+    graph.add_node("tools", executor)
 
     graph.set_entry_point("our_agent")
 
@@ -96,4 +170,10 @@ async def build_ai_agent():
 
     graph.add_edge("tools", "our_agent")
 
-    return graph.compile(), client, initial_state
\ No newline at end of file
+    app = graph.compile()
+    app.compactor = compactor
+    app.router = router
+    app.tool_cache = tool_cache
+    app.tool_refresh = refresh_task
+
+    return app, client, initial_state
\ No newline at end of file
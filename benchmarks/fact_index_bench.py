@@ -0,0 +1,88 @@
+"""
+So sánh latency query giữa Chroma PersistentClient và FactIndex (NumPy).
+
+    python benchmarks/fact_index_bench.py --sizes 100 500 1000 5000 --queries 200
+
+Dữ liệu là vector ngẫu nhiên cùng số chiều với all-MiniLM-L6-v2 nên không cần load model.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from tools.factIndex import FactIndex
+
+DIM = 384
+CATEGORIES = ["profile", "preference", "goal", "conversation", "general"]
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def time_queries(run_query, queries, category) -> list[float]:
+    samples = []
+    for i, q in enumerate(queries):
+        filters = {"category": category} if i % 2 else None
+        start = time.perf_counter()
+        run_query(q, filters)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_size(n: int, num_queries: int, k: int, workdir: str) -> list[tuple[str, list[float]]]:
+    import chromadb
+
+    rng = np.random.default_rng(n)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    ids = [f"fact-{i}" for i in range(n)]
+    docs = [f"fact number {i}" for i in range(n)]
+    metas = [{"category": CATEGORIES[i % len(CATEGORIES)]} for i in range(n)]
+    queries = rng.standard_normal((num_queries, DIM)).astype(np.float32)
+
+    client = chromadb.PersistentClient(path=os.path.join(workdir, f"chroma-{n}"))
+    collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+    for start in range(0, n, 1000):
+        collection.add(
+            ids=ids[start:start + 1000],
+            documents=docs[start:start + 1000],
+            metadatas=metas[start:start + 1000],
+            embeddings=vectors[start:start + 1000].tolist(),
+        )
+
+    results = []
+    results.append(("chroma", time_queries(
+        lambda q, f: collection.query(query_embeddings=[q.tolist()], n_results=k, where=f),
+        queries, "preference",
+    )))
+    for quantize in (False, True):
+        index = FactIndex(os.path.join(workdir, f"index-{n}-{quantize}"), quantize=quantize)
+        index.rebuild(ids, docs, metas, vectors)
+        index.save()
+        index.load()  # đo trên bản memory-mapped
+        label = "numpy-int8" if quantize else "numpy-f32"
+        results.append((label, time_queries(
+            lambda q, f: index.query(q, k, f), queries, "preference",
+        )))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'facts':>6} {'backend':<11} {'p50 ms':>8} {'p99 ms':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            for label, samples in bench_size(n, args.queries, args.k, workdir):
+                print(f"{n:>6} {label:<11} {percentile_ms(samples, 50):>8.3f} {percentile_ms(samples, 99):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
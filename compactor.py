@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Sequence
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from contextBuilder import CHARS_PER_TOKEN, estimate_tokens, message_text
+
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", 600))
+# Số summary cùng cấp được gộp thành một summary cấp trên
+SUMMARY_FAN_IN = int(os.getenv("SUMMARY_FAN_IN", 4))
+
+SUMMARIZE_PROMPT = (
+    "You maintain the long-term memory of a personal assistant conversation. "
+    "Condense the following content into a short factual summary (at most {max_words} words). "
+    "Keep user facts, decisions, open tasks, dates and tool results that may matter later. "
+    "Drop greetings and filler. Answer with the summary only, in the conversation's language."
+)
+
+
+class ConversationCompactor:
+    """
+    Nén các lượt hội thoại bị loại khỏi history thành rolling summary có giới hạn.
+
+    Summary được tổ chức theo cấp: levels[0] chứa summary của từng đợt eviction,
+    khi một cấp có quá SUMMARY_FAN_IN phần tử thì chúng được gộp thành một
+    summary ở cấp trên (summary của summary). Việc gọi model chạy trong
+    background task nên không chặn lượt trả lời của user.
+    """
+
+    def __init__(self, model, max_summary_tokens: int = SUMMARY_MAX_TOKENS, fan_in: int = SUMMARY_FAN_IN, on_update: Callable[[str, str, list[list[str]]], None] | None = None):
+        self.model = model
+        # Gọi với (session_id, summary, levels) mỗi khi một đợt nén xong, để lưu ngay xuống đĩa
+        self.on_update = on_update
+        self.max_summary_tokens = max_summary_tokens
+        self.fan_in = fan_in
+        self._levels: dict[str, list[list[str]]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def seed(self, session_id: str, levels: list[list[str]] | None):
+        """Khôi phục summary levels đã lưu trong state."""
+        if levels and session_id not in self._levels:
+            self._levels[session_id] = [list(level) for level in levels]
+
+    def levels(self, session_id: str) -> list[list[str]]:
+        return [list(level) for level in self._levels.get(session_id, [])]
+
+    def summary(self, session_id: str) -> str:
+        # Cấp cao (cũ nhất) trước, cấp 0 (mới nhất) sau
+        parts = [s for level in reversed(self._levels.get(session_id, [])) for s in level]
+        return self._cap("\n".join(parts))
+
+    def submit(self, session_id: str, evicted: Sequence[BaseMessage]) -> asyncio.Task | None:
+        """Lên lịch nén các message bị evict, trả về ngay."""
+        transcript = "\n".join(
+            f"{m.type}: {text}" for m in evicted if (text := message_text(m).strip())
+        )
+        if not transcript:
+            return None
+        task = asyncio.create_task(self._compact(session_id, transcript), name=f"compact:{session_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def forget(self, session_id: str) -> bool:
+        """
+        Bỏ summary và lock của session khỏi bộ nhớ (session đã được lưu xuống đĩa).
+        Trả về False và giữ nguyên nếu session còn task nén đang chạy.
+        """
+        if any(task.get_name() == f"compact:{session_id}" for task in self._tasks):
+            return False
+        self._levels.pop(session_id, None)
+        self._locks.pop(session_id, None)
+        return True
+
+    async def drain(self):
+        """Chờ các task nén đang chạy (dùng khi shutdown)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def _compact(self, session_id: str, transcript: str):
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            levels = self._levels.setdefault(session_id, [])
+            chunk = await self._summarize(transcript)
+            if not levels:
+                levels.append([])
+            levels[0].append(chunk)
+
+            depth = 0
+            while depth < len(levels) and len(levels[depth]) > self.fan_in:
+                merged = await self._summarize("\n".join(levels[depth]))
+                levels[depth] = []
+                if depth + 1 == len(levels):
+                    levels.append([])
+                levels[depth + 1].append(merged)
+                depth += 1
+
+            # Vẫn vượt giới hạn: gộp toàn bộ thành một summary duy nhất
+            if estimate_tokens("\n".join(s for level in levels for s in level)) > self.max_summary_tokens:
+                everything = "\n".join(s for level in reversed(levels) for s in level)
+                self._levels[session_id] = [[], [await self._summarize(everything)]]
+
+            if self.on_update:
+                try:
+                    self.on_update(session_id, self.summary(session_id), self.levels(session_id))
+                except Exception:
+                    logging.exception(f"Saving the summary of session {session_id} failed")
+
+    async def _summarize(self, content: str) -> str:
+        max_words = max(self.max_summary_tokens // (2 * self.fan_in), 20)
+        try:
+            response = await self.model.ainvoke(
+                [
+                    SystemMessage(content=SUMMARIZE_PROMPT.format(max_words=max_words)),
+                    HumanMessage(content=content),
+                ],
+                config={"tags": ["nostream"]},
+            )
+            text = response.content if isinstance(response.content, str) else message_text(response)
+        except Exception as e:
+            logging.warning(f"Conversation compaction failed, falling back to truncation: {e}")
+            text = content
+        return self._cap(text.strip(), self.max_summary_tokens // self.fan_in)
+
+    def _cap(self, text: str, max_tokens: int | None = None) -> str:
+        max_tokens = max_tokens or self.max_summary_tokens
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        # giữ phần cuối (mới nhất)
+        return text[-max_tokens * CHARS_PER_TOKEN:]
@@ -0,0 +1,156 @@
+import json
+import os
+from typing import Callable, Sequence
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 8000))
+
+# Ước lượng ~4 ký tự / token, cộng overhead cho role và phân tách
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+TOKEN_COUNT_KEY = "token_count"
+# Phần tối thiểu của mỗi kết quả tool được giữ lại khi lượt hiện tại vượt budget
+MIN_TOOL_RESULT_CHARS = 200
+# Một kết quả tool chiếm tối đa phần này của budget, dù lượt hiện tại còn chỗ
+TOOL_RESULT_BUDGET_SHARE = float(os.getenv("TOOL_RESULT_BUDGET_SHARE", 0.25))
+# Phần budget giữ cho các lượt gần nhất, lượt hiện tại không được dùng tới
+RECENT_HISTORY_BUDGET_SHARE = float(os.getenv("RECENT_HISTORY_BUDGET_SHARE", 0.25))
+
+
+def message_text(message: BaseMessage) -> str:
+    """Lấy toàn bộ text của message, kể cả tool call arguments."""
+    content = message.content
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and "text" in part:
+                parts.append(str(part["text"]))
+        content = "\n".join(parts)
+    text = str(content or "")
+
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps(
+            [{"name": c["name"], "args": c["args"]} for c in tool_calls],
+            ensure_ascii=False,
+        )
+    return text
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def count_message_tokens(message: BaseMessage, counter: Callable[[str], int] = estimate_tokens) -> int:
+    """Đếm token của message, kết quả được cache trong response_metadata."""
+    cached = message.response_metadata.get(TOKEN_COUNT_KEY)
+    if cached is not None:
+        return cached
+    tokens = counter(message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+    message.response_metadata[TOKEN_COUNT_KEY] = tokens
+    return tokens
+
+
+def group_messages(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """
+    Gom message thành các block không thể tách rời:
+    một AIMessage có tool_calls luôn đi cùng các ToolMessage trả lời nó.
+    """
+    blocks: list[list[BaseMessage]] = []
+    pending_ids: set[str] = set()
+    for message in messages:
+        if isinstance(message, ToolMessage) and blocks and message.tool_call_id in pending_ids:
+            blocks[-1].append(message)
+            pending_ids.discard(message.tool_call_id)
+            continue
+        blocks.append([message])
+        pending_ids = set()
+        if isinstance(message, AIMessage) and message.tool_calls:
+            pending_ids = {c["id"] for c in message.tool_calls if c.get("id")}
+    return blocks
+
+
+def current_turn_start(blocks: Sequence[Sequence[BaseMessage]]) -> int:
+    """Index của block chứa HumanMessage cuối cùng (block cuối nếu không có)."""
+    for i in range(len(blocks) - 1, -1, -1):
+        if isinstance(blocks[i][0], HumanMessage):
+            return i
+    return max(len(blocks) - 1, 0)
+
+
+class ContextBuilder:
+    """Chọn các message gần nhất vừa với token budget của prompt."""
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, counter: Callable[[str], int] = estimate_tokens):
+        self.token_budget = token_budget
+        self.counter = counter
+
+    def count(self, message: BaseMessage) -> int:
+        return count_message_tokens(message, self.counter)
+
+    def build(self, messages: Sequence[BaseMessage], prefix: Sequence[BaseMessage] = (), token_budget: int | None = None) -> list[BaseMessage]:
+        """Trả về prefix + lượt hiện tại + các block cũ gần nhất sao cho tổng token <= budget."""
+        context, _ = self.split(messages, prefix, token_budget)
+        return context
+
+    def split(self, messages: Sequence[BaseMessage], prefix: Sequence[BaseMessage] = (), token_budget: int | None = None) -> tuple[list[BaseMessage], list[BaseMessage]]:
+        """
+        Trả về (context, dropped): context là prompt gửi cho model, dropped là
+        các message đầu history không vừa budget (đúng phần cần evict/nén).
+
+        Lượt hiện tại (từ HumanMessage cuối cùng trở đi) luôn được giữ nguyên
+        vẹn, nhưng mỗi ToolMessage bị rút gọn về tối đa TOOL_RESULT_BUDGET_SHARE
+        của budget, và cả lượt không được dùng phần RECENT_HISTORY_BUDGET_SHARE
+        giữ cho các lượt trước. Nhờ vậy một kết quả tool lớn không đẩy toàn bộ
+        history ra ngoài. Context luôn bắt đầu bằng HumanMessage, không bằng AI/Tool.
+        """
+        budget = token_budget or self.token_budget
+        remaining = budget - sum(self.count(m) for m in prefix)
+
+        blocks = group_messages(messages)
+        start = current_turn_start(blocks)
+        current = [m for block in blocks[start:] for m in block]
+        current_budget = remaining - int(budget * RECENT_HISTORY_BUDGET_SHARE) if start else remaining
+        current = self._shrink_tool_results(current, current_budget, int(budget * TOOL_RESULT_BUDGET_SHARE))
+        remaining -= sum(self.count(m) for m in current)
+
+        selected: list[list[BaseMessage]] = []
+        for block in reversed(blocks[:start]):
+            tokens = sum(self.count(m) for m in block)
+            if tokens > remaining:
+                break
+            selected.append(block)
+            remaining -= tokens
+
+        # Không bắt đầu context bằng AIMessage hay ToolMessage mồ côi
+        while selected and not isinstance(selected[-1][0], HumanMessage):
+            selected.pop()
+
+        older = [m for block in reversed(selected) for m in block]
+        dropped = [m for block in blocks[:start - len(selected)] for m in block]
+        return [*prefix, *older, *current], dropped
+
+    def _shrink_tool_results(self, turn: list[BaseMessage], budget: int, max_tool_tokens: int) -> list[BaseMessage]:
+        """
+        Rút gọn nội dung ToolMessage (bản sao, history không đổi): mỗi kết quả
+        tối đa max_tool_tokens, và nhỏ hơn nữa nếu cả lượt vẫn vượt budget.
+        """
+        tool_indexes = [i for i, m in enumerate(turn) if isinstance(m, ToolMessage)]
+        if not tool_indexes:
+            return turn
+        fixed = sum(self.count(m) for i, m in enumerate(turn) if i not in tool_indexes)
+        per_tool_tokens = min(max(budget - fixed, 0) // len(tool_indexes), max_tool_tokens) - MESSAGE_OVERHEAD_TOKENS
+        # chừa chỗ cho dòng "...[truncated N chars]"
+        max_chars = max(per_tool_tokens * CHARS_PER_TOKEN - 40, MIN_TOOL_RESULT_CHARS)
+
+        shrunk = list(turn)
+        for i in tool_indexes:
+            text = message_text(turn[i])
+            if len(text) > max_chars:
+                shrunk[i] = turn[i].model_copy(update={
+                    "content": f"{text[:max_chars]}\n...[truncated {len(text) - max_chars} chars]",
+                    "response_metadata": {},
+                })
+        return shrunk
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
+from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
+from langchain_core.messages import HumanMessage
+from aiAssistant import build_ai_agent
+from agentStream import stream_turn_events
+from contextBuilder import message_text
+from util import DEFAULT_SESSION_ID, load_state, release_state_store, save_state
+
+load_dotenv()
+
+GATEWAY_HOST = os.getenv("GATEWAY_HOST", "127.0.0.1")
+GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", 8080))
+# Số lượt chạy graph đồng thời tối đa trong process
+GATEWAY_MAX_CONCURRENT_TURNS = int(os.getenv("GATEWAY_MAX_CONCURRENT_TURNS", 32))
+# Chờ tối đa bao lâu để có slot trước khi trả 503
+GATEWAY_ADMISSION_TIMEOUT = float(os.getenv("GATEWAY_ADMISSION_TIMEOUT", 10))
+# Session không dùng quá lâu được bỏ khỏi bộ nhớ (state vẫn nằm trên đĩa)
+GATEWAY_SESSION_IDLE_TTL = float(os.getenv("GATEWAY_SESSION_IDLE_TTL", 1800))
+
+
+class Session:
+    def __init__(self, state: dict):
+        self.state = state
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        # Số WebSocket đang giữ session; session có socket mở không bị evict
+        self.sockets = 0
+
+
+class Admission:
+    """Lock của session + một slot; release() gọi nhiều lần cũng chỉ trả một lần."""
+
+    def __init__(self, manager: "SessionManager", session: Session):
+        self.manager = manager
+        self.session = session
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.manager._release(self.session)
+
+
+class SessionManager:
+    """
+    State riêng cho từng session trên cùng một graph và một kết nối MCP.
+
+    Mỗi session chỉ chạy một lượt tại một thời điểm (gửi thêm khi đang bận
+    -> 429). Tổng số lượt chạy đồng thời bị giới hạn bởi semaphore; chờ quá
+    admission_timeout -> 503 để client thử lại thay vì xếp hàng vô hạn.
+    """
+
+    def __init__(self, agent, initial_state: dict, max_concurrent: int = GATEWAY_MAX_CONCURRENT_TURNS, admission_timeout: float = GATEWAY_ADMISSION_TIMEOUT, idle_ttl: float = GATEWAY_SESSION_IDLE_TTL):
+        self.agent = agent
+        self.initial_state = initial_state
+        self.max_concurrent = max_concurrent
+        self.admission_timeout = admission_timeout
+        self.idle_ttl = idle_ttl
+        self._sessions: dict[str, Session] = {DEFAULT_SESSION_ID: Session(initial_state)}
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._stats = {"in_flight": 0, "turns": 0, "rejected_busy": 0, "rejected_overload": 0}
+
+    def get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            template = {
+                **self.initial_state,
+                "messages": [],
+                "summary": "",
+                "summary_levels": [],
+                "session_id": session_id,
+            }
+            try:
+                state = load_state(template)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            self.agent.compactor.seed(session_id, state.get("summary_levels"))
+            session = self._sessions[session_id] = Session(state)
+        session.last_used = time.monotonic()
+        return session
+
+    async def admit(self, session: Session) -> Admission:
+        """Giữ lock của session và một slot cho tới khi Admission.release() (run_turn tự gọi)."""
+        if session.lock.locked():
+            self._stats["rejected_busy"] += 1
+            raise HTTPException(status_code=429, detail="Session is busy", headers={"Retry-After": "1"})
+        await session.lock.acquire()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            session.lock.release()
+            self._stats["rejected_overload"] += 1
+            raise HTTPException(status_code=503, detail="Server is at capacity", headers={"Retry-After": "5"})
+        self._stats["in_flight"] += 1
+        return Admission(self, session)
+
+    def _release(self, session: Session):
+        self._stats["in_flight"] -= 1
+        self._slots.release()
+        session.lock.release()
+        session.last_used = time.monotonic()
+
+    async def run_turn(self, admission: Admission, text: str) -> AsyncIterator[tuple[str, dict]]:
+        """Chạy một lượt đã được admit, yield event; state của session chỉ đổi khi lượt xong."""
+        session = admission.session
+        try:
+            state = {**session.state, "messages": [*session.state["messages"], HumanMessage(content=text)]}
+            async for event, data in stream_turn_events(self.agent, state):
+                if event == "done":
+                    session.state = data.pop("state")
+                    self._stats["turns"] += 1
+                yield event, data
+        except Exception as e:
+            logging.exception("Turn failed")
+            yield "error", {"detail": str(e)}
+        finally:
+            admission.release()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if session_id == DEFAULT_SESSION_ID or session.lock.locked() or session.sockets:
+                continue
+            if now - session.last_used > self.idle_ttl:
+                # Summary nén xong sau lượt cuối chỉ có trong compactor: lưu lại trước khi bỏ
+                compactor = self.agent.compactor
+                summary, levels = compactor.summary(session_id), compactor.levels(session_id)
+                if not compactor.forget(session_id):
+                    continue  # còn đang nén, để lần quét sau
+                save_state({**session.state, "summary": summary, "summary_levels": levels})
+                del self._sessions[session_id]
+                release_state_store(session_id)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "sessions_loaded": len(self._sessions),
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+class MessageRequest(BaseModel):
+    message: str
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Graph, MCP client, model và tool chỉ được dựng một lần cho mọi session
+    agent, client, initial_state = await build_ai_agent()
+    app.state.agent = agent
+    app.state.sessions = SessionManager(agent, initial_state)
+
+    async def sweep():
+        while True:
+            await asyncio.sleep(60)
+            app.state.sessions.evict_idle()
+
+    sweeper = asyncio.create_task(sweep())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        if agent.tool_refresh:
+            agent.tool_refresh.cancel()
+        await agent.compactor.drain()
+        await client.cleanup()
+
+
+app = FastAPI(title="AI assistant gateway", lifespan=lifespan)
+
+
+@app.post("/sessions/{session_id}/messages")
+async def post_message(session_id: str, body: MessageRequest, request: Request):
+    """Gửi một tin nhắn, nhận câu trả lời dạng SSE (token, tool_call, ..., done)."""
+    sessions: SessionManager = request.app.state.sessions
+    session = sessions.get(session_id)
+    admission = await sessions.admit(session)
+
+    async def events():
+        async for event, data in sessions.run_turn(admission, body.message):
+            yield {"event": event, "data": json.dumps(data, ensure_ascii=False)}
+
+    # background: trả slot cả khi client ngắt trước khi stream bắt đầu
+    return EventSourceResponse(events(), background=BackgroundTask(admission.release))
+
+
+@app.websocket("/sessions/{session_id}/ws")
+async def session_socket(websocket: WebSocket, session_id: str):
+    """Mỗi tin nhắn {"message": ...} nhận về chuỗi event {"event": ..., ...}."""
+    await websocket.accept()
+    sessions: SessionManager = websocket.app.state.sessions
+    try:
+        session = sessions.get(session_id)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    session.sockets += 1
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                admission = await sessions.admit(session)
+            except HTTPException as e:
+                await websocket.send_json({"event": "error", "status": e.status_code, "detail": e.detail})
+                continue
+            turn = sessions.run_turn(admission, str(payload.get("message", "")))
+            try:
+                async for event, data in turn:
+                    await websocket.send_json({"event": event, **data})
+            finally:
+                await turn.aclose()
+                admission.release()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.sockets -= 1
+        session.last_used = time.monotonic()
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str, request: Request):
+    session = request.app.state.sessions.get(session_id)
+    return {
+        "session_id": session_id,
+        "summary": session.state.get("summary", ""),
+        "messages": [{"type": m.type, "content": message_text(m)} for m in session.state["messages"]],
+    }
+
+
+@app.get("/health")
+async def health(request: Request):
+    agent = request.app.state.agent
+    return {
+        "sessions": request.app.state.sessions.stats(),
+        "tool_router": agent.router.stats(),
+        "tool_cache": agent.tool_cache.stats(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=GATEWAY_HOST, port=GATEWAY_PORT)
@@ -1,34 +1,40 @@
+import hashlib
+from collections import OrderedDict
 from pathlib import Path
 from util import load_yaml
 from langchain_core.messages import SystemMessage
-from tools.updateUserFact import query_user_facts
+from tools.updateUserFact import aquery_user_facts, fact_version, query_user_facts
 
 
 INSTRUCTION_PATH = Path("instruction")
+PREFERENCE_QUERY = "sở thích"
+PREFERENCE_CATEGORY = "preference"
 
 class InstructionManager:
-    def __init__(self):
-        self.instruction_path = INSTRUCTION_PATH
-        
+    """
+    Build system prompt từ system.yaml, domain.yaml, mô tả tool và sở thích của user.
+
+    Prompt được cache theo (mtime của các file YAML, version của fact
+    preference, fingerprint của tập tool). Mỗi section chỉ build lại khi input
+    của chính nó thay đổi, nên gọi `system_prompt()` mỗi lượt gần như miễn phí
+    mà sửa YAML hay lưu sở thích mới vẫn có hiệu lực ngay lượt sau.
+    """
+
+    def __init__(self, instruction_path: Path = INSTRUCTION_PATH, max_cached_prompts: int = 32):
+        self.instruction_path = instruction_path
+        self.max_cached_prompts = max_cached_prompts
+        self._yaml: dict[Path, tuple[int, list[str]]] = {}
+        self._sections: dict[str, tuple[tuple, str]] = {}
+        self._preferences: tuple[int, list[str]] | None = None
+        self._prompts: OrderedDict[tuple, SystemMessage] = OrderedDict()
+
     def compile_instructions(self, domain_instructions: list[str]):
-        system_level = load_yaml(self.instruction_path / "system.yaml").get("system", [])
-        domain_level = load_yaml(self.instruction_path / "domain"/"domain.yaml").get("domain", [])
-
-        final_prompt = "### System Instructions:\n"
-        for instr in system_level:
-            final_prompt += f"- {instr}\n"
-
-        final_prompt += "\n### Domain Instructions:\n"
-        all_domain_instr = domain_level + domain_instructions
-        for instr in all_domain_instr:
-            final_prompt += f"- {instr}\n"
-        
-        final_prompt += "\n### User Instructions:\n"
-        preference = query_user_facts (query="sở thích", category="preference")
-        for instr in preference:
-            final_prompt += f"- {instr}\n"
-            
-        return final_prompt
+        preference_key = fact_version(PREFERENCE_CATEGORY)
+        if self._preferences is None or self._preferences[0] != preference_key:
+            preference = query_user_facts(query=PREFERENCE_QUERY, category=PREFERENCE_CATEGORY)
+            self._preferences = (preference_key, preference)
+        return self._render(domain_instructions)
+
     @staticmethod
     def build_domain_instructions(tools_meta: list[dict]) -> list[str]:
         domain_instructions = []
@@ -37,11 +43,78 @@ class InstructionManager:
             desc = tool["description"]
             domain_instructions.append(f"Use tool `{name}` when: {desc}")
         return domain_instructions
-    
-    async def load_system_instructions(self,tools_meta : list[dict]):
-        domain_instructions = self.build_domain_instructions(tools_meta)
 
-        final_prompt = self.compile_instructions(
-            domain_instructions=domain_instructions
+    @staticmethod
+    def tool_fingerprint(tools_meta: list[dict]) -> str:
+        digest = hashlib.sha1()
+        for tool in tools_meta:
+            digest.update(f"{tool['name']}\0{tool['description']}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def system_prompt(self, tools_meta: list[dict]) -> SystemMessage:
+        """
+        System prompt cho tập tool của lượt hiện tại.
+        Trả về cùng một SystemMessage khi không có input nào thay đổi.
+
+        Không lưu tools_meta lên self: nhiều session gọi song song, mỗi lượt
+        một tập tool khác nhau.
+        """
+        key = (
+            self._yaml_mtime("system.yaml"),
+            self._yaml_mtime("domain", "domain.yaml"),
+            fact_version(PREFERENCE_CATEGORY),
+            self.tool_fingerprint(tools_meta),
         )
-        return SystemMessage(content=final_prompt)
\ No newline at end of file
+        prompt = self._prompts.get(key)
+        if prompt is not None:
+            self._prompts.move_to_end(key)
+            return prompt
+
+        preferences = self._preferences
+        if preferences is None or preferences[0] != key[2]:
+            preferences = (key[2], await aquery_user_facts(query=PREFERENCE_QUERY, category=PREFERENCE_CATEGORY))
+            self._preferences = preferences
+
+        prompt = SystemMessage(content=self._render(self.build_domain_instructions(tools_meta), key[3], preferences))
+        self._prompts[key] = prompt
+        while len(self._prompts) > self.max_cached_prompts:
+            self._prompts.popitem(last=False)
+        return prompt
+
+    async def load_system_instructions(self, tools_meta : list[dict]):
+        return await self.system_prompt(tools_meta)
+
+    def _render(self, domain_instructions: list[str], tools_key: str | None = None, preferences: tuple[int, list[str]] | None = None) -> str:
+        system_mtime, system_level = self._yaml_items("system", "system.yaml")
+        domain_mtime, domain_level = self._yaml_items("domain", "domain", "domain.yaml")
+        preference_version, preference = preferences or self._preferences
+
+        tools_key = tools_key or hashlib.sha1("\0".join(domain_instructions).encode("utf-8")).hexdigest()
+        return "\n".join([
+            self._section("system", (system_mtime,), "### System Instructions:", system_level),
+            self._section("domain", (domain_mtime, tools_key), "### Domain Instructions:", domain_level + domain_instructions),
+            self._section("user", (preference_version,), "### User Instructions:", preference),
+        ])
+
+    def _section(self, name: str, key: tuple, title: str, items: list[str]) -> str:
+        cached = self._sections.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        text = "\n".join([title, *(f"- {instr}" for instr in items)]) + "\n"
+        self._sections[name] = (key, text)
+        return text
+
+    def _yaml_mtime(self, *parts: str) -> int:
+        try:
+            return self.instruction_path.joinpath(*parts).stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _yaml_items(self, key: str, *parts: str) -> tuple[int, list[str]]:
+        path = self.instruction_path.joinpath(*parts)
+        mtime = self._yaml_mtime(*parts)
+        cached = self._yaml.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, load_yaml(path).get(key, []))
+            self._yaml[path] = cached
+        return cached
@@ -1,9 +1,37 @@
 import asyncio
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage
 from aiAssistant import build_ai_agent
+from agentStream import stream_turn_events
+
+
+async def stream_turn(app, state: dict) -> tuple[dict, float | None]:
+    """Chạy một lượt, in token ngay khi model sinh ra; trả về state mới và TTFT (ms)."""
+    streaming = False
+    async for event, data in stream_turn_events(app, state):
+        if event == "token":
+            if not streaming:
+                print("AI: ", end="", flush=True)
+                streaming = True
+            print(data["text"], end="", flush=True)
+            continue
+        if streaming:
+            print()
+            streaming = False
+        if event == "tool_call":
+            print(f"[calling {', '.join(data['names'])}]")
+        elif event == "tool_error":
+            print(f"[{data['name']} failed]")
+        elif event == "message":
+            print(f"AI: {data['text']}")
+        elif event == "done":
+            ttft = data["ttft_ms"]
+            print(f"(TTFT {f'{ttft:.0f} ms' if ttft is not None else 'n/a'}, total {data['total_ms'] / 1000:.2f} s)")
+            return data["state"], ttft
+    return state, None
+
 
 async def main():
-    app, client, state = await build_ai_agent() 
+    app, client, state = await build_ai_agent()
 
     try:
         while True:
@@ -12,15 +40,13 @@ async def main():
                 print("Bye!")
                 break
 
-            state["messages"].append(HumanMessage(content=user_input))
-
-            async for s in app.astream(state, stream_mode="values"):
-                message = s["messages"][-1]
-                state["messages"].append(message)
-        
-                if isinstance(message, (AIMessage, HumanMessage)):
-                    message.pretty_print()
+            state["messages"] = [*state["messages"], HumanMessage(content=user_input)]
+            state, _ = await stream_turn(app, state)
     finally:
+        if app.tool_refresh:
+            app.tool_refresh.cancel()
+        # Đợi summary đang nén ở background để lần chạy sau không mất
+        await app.compactor.drain()
         await client.cleanup()
 
 
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+MCP_SERVER_THREADS = int(os.getenv("MCP_SERVER_THREADS", 8))
+
+# Số lời gọi đồng thời tối đa của từng tool trên server
+SERVER_TOOL_LIMITS = {
+    "send_email": 2,
+    "send_bulk_email": 1,
+    "create_google_calendar_event": 4,
+    "create_google_calendar_events": 2,
+    "list_upcoming_events": 4,
+}
+
+
+class BlockingToolExecutor:
+    """
+    Chạy phần thân đồng bộ của tool (smtplib, googleapiclient .execute())
+    trên một thread pool có giới hạn để event loop của FastMCP không bị chặn.
+
+    Mỗi tool có semaphore riêng; số request đang chờ / đang chạy được ghi lại
+    để theo dõi qua `metrics()`.
+    """
+
+    def __init__(self, max_workers: int = MCP_SERVER_THREADS, limits: dict[str, int] | None = None):
+        self.max_workers = max_workers
+        self.limits = SERVER_TOOL_LIMITS if limits is None else limits
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-tool")
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._metrics: dict[str, dict] = {}
+
+    async def run(self, tool_name: str, fn, *args, **kwargs):
+        metrics = self._metrics.setdefault(tool_name, {
+            "queued": 0, "running": 0, "completed": 0, "failed": 0, "total_seconds": 0.0,
+        })
+        semaphore = self._semaphore(tool_name)
+
+        metrics["queued"] += 1
+        try:
+            if semaphore:
+                await semaphore.acquire()
+        finally:
+            metrics["queued"] -= 1
+
+        metrics["running"] += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+            metrics["completed"] += 1
+            return result
+        except Exception:
+            metrics["failed"] += 1
+            raise
+        finally:
+            metrics["running"] -= 1
+            metrics["total_seconds"] += time.perf_counter() - start
+            if semaphore:
+                semaphore.release()
+
+    def metrics(self) -> dict:
+        tools = {}
+        for name, m in self._metrics.items():
+            finished = m["completed"] + m["failed"]
+            tools[name] = {
+                **{k: v for k, v in m.items() if k != "total_seconds"},
+                "avg_ms": round(m["total_seconds"] / finished * 1000, 2) if finished else 0.0,
+                "limit": self.limits.get(name),
+            }
+        return {
+            "max_workers": self.max_workers,
+            "queue_depth": sum(m["queued"] for m in self._metrics.values()),
+            "running": sum(m["running"] for m in self._metrics.values()),
+            "tools": tools,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _semaphore(self, tool_name: str) -> asyncio.Semaphore | None:
+        limit = self.limits.get(tool_name)
+        if not limit:
+            return None
+        if tool_name not in self._semaphores:
+            self._semaphores[tool_name] = asyncio.Semaphore(limit)
+        return self._semaphores[tool_name]
@@ -0,0 +1,59 @@
+import logging
+import threading
+import time
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyBackend(Generic[T]):
+    """
+    Tạo backend của tool (EmailTool, GoogleCalendarTool, ...) ở lần dùng đầu tiên.
+
+    Server trả lời initialize / list_tools ngay mà không phải chờ load
+    credentials hay build API client. Backend lỗi khi khởi tạo (vd. thiếu file
+    credentials) chỉ làm tool của nó báo lỗi, được thử tạo lại sau
+    retry_after giây, và trạng thái được báo qua `status()`.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], retry_after: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.retry_after = retry_after
+        self._instance: T | None = None
+        self._error: Exception | None = None
+        self._failed_at = 0.0
+        self._init_ms: float | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        if self._instance is not None:
+            return self._instance
+        with self._lock:
+            if self._instance is not None:
+                return self._instance
+            if self._error is not None and time.monotonic() - self._failed_at < self.retry_after:
+                raise self._error
+            start = time.perf_counter()
+            try:
+                self._instance = self.factory()
+            except Exception as e:
+                logging.error(f"Backend '{self.name}' failed to initialize: {e}")
+                self._error = e
+                self._failed_at = time.monotonic()
+                raise
+            self._init_ms = round((time.perf_counter() - start) * 1000, 2)
+            self._error = None
+            logging.info(f"Backend '{self.name}' ready in {self._init_ms} ms")
+            return self._instance
+
+    def call(self, method: str, *args, **kwargs):
+        """Gọi method của backend; dùng làm fn cho BlockingToolExecutor.run."""
+        return getattr(self.get(), method)(*args, **kwargs)
+
+    def status(self) -> dict:
+        if self._instance is not None:
+            return {"state": "ready", "init_ms": self._init_ms}
+        if self._error is not None:
+            return {"state": "error", "error": str(self._error)}
+        return {"state": "not_started"}
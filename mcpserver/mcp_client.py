@@ -1,7 +1,13 @@
+import os
 from typing import Optional
 from contextlib import AsyncExitStack
 from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp.client.stdio import get_default_environment, stdio_client
+from mcp.client.sse import sse_client
+
+MCP_HTTP_TIMEOUT = float(os.getenv("MCP_HTTP_TIMEOUT", 10))
+# Stream SSE bị đóng nếu im lặng quá lâu; health check ping của pool giữ cho nó sống
+MCP_SSE_READ_TIMEOUT = float(os.getenv("MCP_SSE_READ_TIMEOUT", 3600))
 
 
 class MCPClient:
@@ -12,15 +18,23 @@ class MCPClient:
 
     async def connect_to_server(self, server_script_path: str) -> bool:
         """
-        Connects to an MCP server via stdio.
+        Connects to an MCP server via stdio, or via HTTP (SSE) if given a URL.
         """
+        if server_script_path.startswith(("http://", "https://")):
+            return await self.connect_to_url(server_script_path)
+
         is_python = server_script_path.endswith(".py")
         is_js = server_script_path.endswith(".js")
         if not (is_python or is_js):
             raise ValueError("Server script must be a .py or .js file")
 
         command = "python" if is_python else "node"
-        server_params = StdioServerParameters(command=command, args=[server_script_path])
+        # Server tự đọc .env; MCP_TRANSPORT=sse trong đó sẽ làm handshake stdio treo
+        server_params = StdioServerParameters(
+            command=command,
+            args=[server_script_path],
+            env={**get_default_environment(), "MCP_TRANSPORT": "stdio"},
+        )
 
         stdio_transport = await self.exit_stack.enter_async_context(
             stdio_client(server_params)
@@ -33,6 +47,19 @@ class MCPClient:
         await self.session.initialize()
         return True
 
+    async def connect_to_url(self, url: str) -> bool:
+        """
+        Connects to a shared MCP server over HTTP (SSE transport), e.g. http://127.0.0.1:8000/sse.
+        The underlying HTTP connection is kept alive for the whole session.
+        """
+        read, write = await self.exit_stack.enter_async_context(
+            sse_client(url, timeout=MCP_HTTP_TIMEOUT, sse_read_timeout=MCP_SSE_READ_TIMEOUT)
+        )
+        self.session = await self.exit_stack.enter_async_context(ClientSession(read, write))
+
+        await self.session.initialize()
+        return True
+
     async def fetch_tools(self):
         """
         List available tools from the MCP server.
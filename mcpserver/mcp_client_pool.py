@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import logging
+import os
+from mcpserver.mcp_client import MCPClient
+
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", 1))
+MCP_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", 30))
+MCP_PING_TIMEOUT = float(os.getenv("MCP_PING_TIMEOUT", 5))
+
+
+class _PoolWorker:
+    """
+    Một process MCP server và session của nó.
+
+    Toàn bộ vòng đời (connect -> chờ stop -> cleanup) chạy trong một task riêng
+    để anyio cancel scope của stdio_client được mở và đóng trong cùng một task.
+    """
+
+    def __init__(self, index: int, server_script_path: str):
+        self.index = index
+        self.server_script_path = server_script_path
+        self.client = MCPClient()
+        self.in_flight = 0
+        self.alive = False
+        self.error: Exception | None = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-worker-{self.index}")
+        await self._ready.wait()
+        if self.error:
+            raise self.error
+
+    async def _run(self):
+        try:
+            await self.client.connect_to_server(self.server_script_path)
+            self.alive = True
+            self._ready.set()
+            await self._stop.wait()
+        except Exception as e:
+            self.error = e
+            logging.error(f"MCP worker {self.index} stopped: {e}")
+        finally:
+            self.alive = False
+            self._ready.set()
+            try:
+                await self.client.cleanup()
+            except Exception as e:
+                logging.warning(f"MCP worker {self.index} cleanup failed: {e}")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def ping(self) -> bool:
+        if not self.alive or self._task is None or self._task.done():
+            return False
+        try:
+            await asyncio.wait_for(self.client.session.send_ping(), MCP_PING_TIMEOUT)
+            return True
+        except Exception as e:
+            logging.warning(f"MCP worker {self.index} failed health check: {e}")
+            return False
+
+    async def call_tool(self, tool_name: str, tool_args: dict):
+        self.in_flight += 1
+        try:
+            return await self.client.call_tool(tool_name, tool_args)
+        finally:
+            self.in_flight -= 1
+
+
+class MCPClientPool:
+    """
+    Pool N process MCP server, dùng thay thế trực tiếp cho MCPClient.
+
+    call_tool được gửi tới worker đang ít request nhất (hoà thì xoay vòng),
+    nên một tool chậm (SMTP, Calendar) không chặn các tool khác. Một task nền
+    ping từng worker mỗi MCP_HEALTH_INTERVAL giây và khởi động lại worker chết.
+    """
+
+    def __init__(self, size: int = MCP_POOL_SIZE, health_interval: float = MCP_HEALTH_INTERVAL):
+        self.size = max(size, 1)
+        self.health_interval = health_interval
+        self.server_script_path: str | None = None
+        self.workers: list[_PoolWorker] = []
+        self.tools = []
+        self._round_robin = itertools.count()
+        self._respawn_lock = asyncio.Lock()
+        self._health_task: asyncio.Task | None = None
+
+    async def connect_to_server(self, server_script_path: str) -> bool:
+        """
+        Khởi động toàn bộ worker song song.
+        """
+        self.server_script_path = server_script_path
+        self.workers = [_PoolWorker(i, server_script_path) for i in range(self.size)]
+        results = await asyncio.gather(*(w.start() for w in self.workers), return_exceptions=True)
+        if all(isinstance(r, Exception) for r in results):
+            raise results[0]
+        self._health_task = asyncio.create_task(self._health_loop())
+        return True
+
+    async def fetch_tools(self):
+        """
+        List available tools from the MCP server.
+        """
+        worker = await self._pick()
+        self.tools = await worker.client.fetch_tools()
+        return self.tools
+
+    async def call_tool(self, tool_name: str, tool_args: dict):
+        """
+        Call a tool on the least busy worker.
+        """
+        worker = await self._pick()
+        return await worker.call_tool(tool_name, tool_args)
+
+    def stats(self) -> list[dict]:
+        return [
+            {"worker": w.index, "alive": w.alive, "in_flight": w.in_flight}
+            for w in self.workers
+        ]
+
+    async def cleanup(self):
+        """
+        Close all workers.
+        """
+        if self._health_task:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+        await asyncio.gather(*(w.stop() for w in self.workers), return_exceptions=True)
+
+    async def _pick(self) -> _PoolWorker:
+        alive = [w for w in self.workers if w.alive]
+        if not alive:
+            await self._respawn_dead()
+            alive = [w for w in self.workers if w.alive]
+            if not alive:
+                raise RuntimeError("No MCP server worker is available")
+        offset = next(self._round_robin)
+        rotated = alive[offset % len(alive):] + alive[:offset % len(alive)]
+        return min(rotated, key=lambda w: w.in_flight)
+
+    async def _respawn_dead(self, checked: set[int] | None = None):
+        async with self._respawn_lock:
+            for i, worker in enumerate(self.workers):
+                if worker.alive and (checked is None or i not in checked):
+                    continue
+                await worker.stop()
+                replacement = _PoolWorker(worker.index, self.server_script_path)
+                try:
+                    await replacement.start()
+                    logging.info(f"MCP worker {worker.index} respawned")
+                except Exception as e:
+                    logging.error(f"MCP worker {worker.index} respawn failed: {e}")
+                self.workers[i] = replacement
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            healthy = await asyncio.gather(*(w.ping() for w in self.workers))
+            unhealthy = {i for i, ok in enumerate(healthy) if not ok}
+            if unhealthy:
+                await self._respawn_dead(unhealthy)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from mcpserver.mcp_client_pool import MCPClientPool, MCP_POOL_SIZE
+
+# Ngăn cách tên server và tên tool khi namespace, hợp lệ với tên function của Gemini
+NAMESPACE_SEPARATOR = "__"
+
+
+def load_server_config() -> list[dict]:
+    """
+    Đọc danh sách MCP server từ MCP_SERVERS (JSON hoặc đường dẫn tới file JSON):
+
+        [{"name": "docs", "path": "mcpserver/mcp_server.py", "pool_size": 2},
+         {"name": "weather", "path": "mcpserver/server_test.py"}]
+
+    Nếu không có MCP_SERVERS thì dùng một server duy nhất từ SERVER_PATH.
+    """
+    raw = os.getenv("MCP_SERVERS")
+    if not raw:
+        server_path = os.getenv("SERVER_PATH")
+        return [{"name": "docs", "path": server_path}] if server_path else []
+    if not raw.lstrip().startswith("["):
+        raw = Path(raw).read_text(encoding="utf-8")
+    return json.loads(raw)
+
+
+def split_tool_name(name: str) -> tuple[str | None, str]:
+    """Tách tên tool đã namespace thành (server, tool)."""
+    if NAMESPACE_SEPARATOR in name:
+        server, tool = name.split(NAMESPACE_SEPARATOR, 1)
+        return server, tool
+    return None, name
+
+
+def base_tool_name(name: str) -> str:
+    return split_tool_name(name)[1]
+
+
+class MCPRegistry:
+    """
+    Quản lý nhiều MCP server, có cùng interface fetch_tools / call_tool / cleanup như MCPClient.
+
+    Tất cả server được khởi động và list_tools song song nên thời gian startup
+    bằng handshake chậm nhất. Khi có hơn một server, tên tool được namespace
+    thành `<server>__<tool>` và call_tool được định tuyến về đúng session.
+    """
+
+    def __init__(self, servers: list[dict] | None = None):
+        self.servers = load_server_config() if servers is None else servers
+        self.namespaced = len(self.servers) > 1
+        self.clients: dict[str, MCPClientPool] = {}
+        self.tools = []
+        self._routes: dict[str, tuple[str, str]] = {}
+        # Được set khi route của tool đã có (toolset có thể dựng từ metadata đã lưu trước đó)
+        self.ready = asyncio.Event()
+
+    async def connect_to_server(self, server_script_path: str | None = None) -> bool:
+        """
+        Kết nối tới tất cả server đã cấu hình (hoặc chỉ server_script_path nếu truyền vào).
+        """
+        if server_script_path:
+            self.servers = [{"name": "docs", "path": server_script_path}]
+            self.namespaced = False
+        if not self.servers:
+            raise ValueError("No MCP server configured (set MCP_SERVERS or SERVER_PATH)")
+
+        results = await asyncio.gather(
+            *(self._connect(server) for server in self.servers), return_exceptions=True
+        )
+        for server, result in zip(self.servers, results):
+            if isinstance(result, Exception):
+                logging.error(f"MCP server '{server['name']}' failed to start: {result}")
+        if not self.clients:
+            raise RuntimeError("No MCP server could be started")
+        return True
+
+    async def fetch_tools(self, refresh: bool = False):
+        """
+        List tools of every server concurrently, with namespaced names.
+        Tool lists fetched during connect are reused unless refresh=True.
+        """
+        names = [s["name"] for s in self.servers if s["name"] in self.clients]
+        results = await asyncio.gather(*(
+            self.clients[n].fetch_tools() if refresh or not self.clients[n].tools
+            else self._cached_tools(n)
+            for n in names
+        ))
+
+        self.tools = []
+        self._routes = {}
+        for server_name, tools in zip(names, results):
+            for tool in tools:
+                name = self.qualify(server_name, tool["name"])
+                self._routes[name] = (server_name, tool["name"])
+                self.tools.append({**tool, "name": name, "server": server_name})
+        self.ready.set()
+        return self.tools
+
+    async def call_tool(self, tool_name: str, tool_args: dict):
+        """
+        Route a tool call to the server that owns it.
+        """
+        if not self.ready.is_set():
+            await self.ready.wait()
+        route = self._routes.get(tool_name)
+        if route is None:
+            raise ValueError(f"Unknown MCP tool '{tool_name}'")
+        server_name, original_name = route
+        return await self.clients[server_name].call_tool(original_name, tool_args)
+
+    def qualify(self, server_name: str, tool_name: str) -> str:
+        if not self.namespaced:
+            return tool_name
+        return f"{server_name}{NAMESPACE_SEPARATOR}{tool_name}"
+
+    async def cleanup(self):
+        """
+        Close every server.
+        """
+        await asyncio.gather(
+            *(client.cleanup() for client in self.clients.values()), return_exceptions=True
+        )
+
+    async def _connect(self, server: dict):
+        client = MCPClientPool(server.get("pool_size", MCP_POOL_SIZE))
+        await client.connect_to_server(server["path"])
+        # list_tools ngay sau handshake, trong cùng coroutine của server này
+        await client.fetch_tools()
+        self.clients[server["name"]] = client
+
+    async def _cached_tools(self, server_name: str):
+        return self.clients[server_name].tools
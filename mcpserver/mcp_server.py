@@ -1,20 +1,48 @@
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
+import json
 import os
 import sys
 from typing import Optional
+from pydantic import BaseModel, Field
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from mcptools.send_email_tool import EmailTool
 from mcptools.google_calendar_tool import GoogleCalendarTool
-from mcptools.google_search_tool import search_web
+from mcptools.google_search_tool import search_web, SERPER_API_KEY
+from mcpserver.blocking_executor import BlockingToolExecutor
+from mcpserver.lazy_backend import LazyBackend
 
 
 load_dotenv()
 
-mcp = FastMCP("docs")
-email_tool_instance = EmailTool()
-google_calendar_tool_instance = GoogleCalendarTool()
+# MCP_TRANSPORT=sse để một server dùng chung cho nhiều agent qua HTTP
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("MCP_PORT", 8000))
+
+mcp = FastMCP("docs", host=MCP_HOST, port=MCP_PORT)
+# Backend chỉ được tạo ở lần gọi tool đầu tiên để initialize / list_tools trả về ngay
+email_backend = LazyBackend("email", EmailTool)
+calendar_backend = LazyBackend("google_calendar", GoogleCalendarTool)
+# smtplib và googleapiclient là blocking, chạy trên thread pool thay vì event loop
+executor = BlockingToolExecutor()
+
+
+class BulkEmailItem(BaseModel):
+    to_addresses: list[str] = Field(description="Recipient email addresses.")
+    subject: str = Field(description="Subject line of this email.")
+    body: str = Field(description="Plain text body of this email.")
+
+
+class EventInput(BaseModel):
+    summary: str = Field(description="Event title.")
+    start: str = Field(description='ISO start time, e.g. "2025-05-01T10:00:00+07:00".')
+    end: str = Field(description="ISO end time.")
+    description: str = Field("", description="Event details.")
+    location: str = Field("", description="Where the event takes place.")
+    attendees: list[str] = Field([], description="Attendee email addresses.")
+
 
 @mcp.tool()
 async def search(query: str) -> str:
@@ -54,7 +82,24 @@ async def send_email( to_addresses: list, subject: str, body: str):
         Exception: For other errors during the email sending process (e.g., SMTP errors).
   """
   
-  return email_tool_instance.send_text_email( to_addresses, subject, body)
+  return await executor.run("send_email", email_backend.call, "send_text_email", to_addresses, subject, body)
+
+@mcp.tool()
+async def send_bulk_email(messages: list[BulkEmailItem]):
+    """
+    Sends many plain text emails, one per entry, over pooled SMTP connections.
+
+    Args:
+        messages (List[BulkEmailItem]): One entry per email with to_addresses,
+            subject and body.
+
+    Returns:
+        List[dict]: Per-email status: {"to", "status": "success" | "partial" | "error", "error"?}.
+    """
+    return await executor.run(
+        "send_bulk_email", email_backend.call, "send_bulk_email",
+        [message.model_dump() for message in messages],
+    )
 
 @mcp.tool()
 async def create_google_calendar_event(summary: str, location: str, description: str, start_datetime: str, end_datetime: str, attendees: list[str] = []):
@@ -86,7 +131,30 @@ async def create_google_calendar_event(summary: str, location: str, description:
         str: A message indicating the result of the event creation.
     """
 
-    return  google_calendar_tool_instance.insert_event(summary, location, description, start_datetime, end_datetime, attendees)
+    return await executor.run(
+        "create_google_calendar_event",
+        calendar_backend.call, "insert_event",
+        summary, location, description, start_datetime, end_datetime, attendees,
+    )
+
+@mcp.tool()
+async def create_google_calendar_events(events: list[EventInput]):
+    """
+    Creates several Google Calendar events in one call (e.g. a weekly study plan).
+
+    Args:
+        events (List[EventInput]): One entry per event with summary, start, end and
+            optional description, location and attendees.
+
+    Returns:
+        List[dict]: Per-event results in input order:
+            {"index", "status": "success" | "error", "id"?, "htmlLink"?, "error"?}.
+    """
+    return await executor.run(
+        "create_google_calendar_events",
+        calendar_backend.call, "insert_events",
+        [event.model_dump() for event in events],
+    )
 
 @mcp.tool()
 async def list_upcoming_events(max_results: Optional[int] = 10,time_max: Optional[str] = None, time_min: Optional[str] = None):
@@ -102,7 +170,30 @@ async def list_upcoming_events(max_results: Optional[int] = 10,time_max: Optiona
         List[dict]: A list of event details as per Google Calendar API.
     """
     max_results = int(max_results)
-    return google_calendar_tool_instance.list_upcoming_events(max_results, time_max,time_min)
+    return await executor.run(
+        "list_upcoming_events",
+        calendar_backend.call, "list_upcoming_events",
+        max_results, time_max, time_min,
+    )
+
+@mcp.resource("metrics://executor")
+def executor_metrics() -> str:
+    """Queue depth, running count and latency of the blocking tool thread pool."""
+    return json.dumps(executor.metrics())
+
+@mcp.resource("health://tools")
+def tool_health() -> str:
+    """Readiness of each tool's backend; backends are created on first use."""
+    backends = {
+        "send_email": email_backend,
+        "send_bulk_email": email_backend,
+        "create_google_calendar_event": calendar_backend,
+        "create_google_calendar_events": calendar_backend,
+        "list_upcoming_events": calendar_backend,
+    }
+    health = {name: backend.status() for name, backend in backends.items()}
+    health["search"] = {"state": "ready"} if SERPER_API_KEY else {"state": "error", "error": "SERPER_API_KEY is not set"}
+    return json.dumps(health)
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    mcp.run(transport=MCP_TRANSPORT)
\ No newline at end of file
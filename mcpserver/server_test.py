@@ -1,27 +1,36 @@
+import os
+import sys
 from typing import Any
-import httpx
 from mcp.server.fastmcp import FastMCP
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from mcptools.http_client import ManagedHTTPClient
 
 # Initialize FastMCP server
-mcp = FastMCP("weather")
+mcp = FastMCP(
+    "weather",
+    host=os.getenv("MCP_HOST", "127.0.0.1"),
+    port=int(os.getenv("MCP_PORT", 8000)),
+)
 
 # Constants
 NWS_API_BASE = "https://api.weather.gov"
 USER_AGENT = "weather-app/1.0"
 
+http_client = ManagedHTTPClient(timeout=30.0)
+
 async def make_nws_request(url: str) -> dict[str, Any] | None:
     """Make a request to the NWS API with proper error handling."""
     headers = {
         "User-Agent": USER_AGENT,
         "Accept": "application/geo+json"
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            return None
+    try:
+        response = await http_client.get(url, headers=headers, coalesce_key=url)
+        response.raise_for_status()
+        return response.json()
+    except Exception:
+        return None
 
 def format_alert(feature: dict) -> str:
     """Format an alert feature into a readable string."""
@@ -93,4 +102,4 @@ Forecast: {period['detailedForecast']}
 
 if __name__ == "__main__":
     # Initialize and run the server
-    mcp.run(transport='stdio')
\ No newline at end of file
+    mcp.run(transport=os.getenv("MCP_TRANSPORT", "stdio"))
\ No newline at end of file
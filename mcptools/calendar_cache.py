@@ -0,0 +1,188 @@
+import bisect
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+from zoneinfo import ZoneInfo
+from googleapiclient.errors import HttpError
+
+CALENDAR_TIMEZONE = os.getenv("CALENDAR_TIMEZONE", "Asia/Ho_Chi_Minh")
+# Khoảng thời gian tối thiểu giữa hai lần sync incremental
+CALENDAR_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", 30))
+CALENDAR_CACHE_PATH = os.getenv("CALENDAR_CACHE_PATH", "data/calendar_cache.json")
+
+
+def parse_time(value: str | dict | None, tz: ZoneInfo) -> float | None:
+    """
+    Chuyển thời gian của Calendar API ("2024-05-01T10:00:00+07:00", "2024-05-01"
+    hoặc {"dateTime": ...} / {"date": ...}) thành epoch seconds.
+    Giá trị không có múi giờ được hiểu theo tz.
+    """
+    if isinstance(value, dict):
+        value = value.get("dateTime") or value.get("date")
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed.timestamp()
+
+
+class CalendarEventCache:
+    """
+    Bản sao local của một calendar, đồng bộ incremental bằng syncToken.
+
+    - Lần đầu (hoặc khi token hết hạn, HTTP 410) tải toàn bộ event rồi lưu
+      nextSyncToken; các lần sau chỉ tải thay đổi kể từ token đó.
+    - Event được index theo thời gian bắt đầu (list đã sắp xếp) cùng độ dài
+      event lớn nhất, nên truy vấn [time_min, time_max) chỉ cần bisect.
+    - Trạng thái được lưu vào file JSON để khởi động lại không phải full sync.
+
+    http (nếu có) trả về transport riêng cho thread hiện tại, vì httplib2 mà
+    service dùng mặc định không thread-safe.
+    """
+
+    def __init__(self, service, calendar_id: str, path: str | Path | None = CALENDAR_CACHE_PATH, sync_interval: float = CALENDAR_SYNC_INTERVAL, timezone: str = CALENDAR_TIMEZONE, http: Callable[[], object] | None = None):
+        self.service = service
+        self.http = http
+        self.calendar_id = calendar_id
+        self.path = Path(path) if path else None
+        self.sync_interval = sync_interval
+        self.timezone = timezone
+        self.tz = ZoneInfo(timezone)
+        self.sync_token: str | None = None
+        self.last_sync = 0.0
+        self._events: dict[str, dict] = {}
+        self._starts: list[tuple[float, str]] = []
+        self._max_duration = 0.0
+        self._lock = threading.RLock()
+        self._load()
+
+    def query(self, time_min: str | None = None, time_max: str | None = None, max_results: int | None = None) -> list[dict]:
+        """Event giao với [time_min, time_max), sắp xếp theo thời gian bắt đầu."""
+        self.ensure_fresh()
+        lower = parse_time(time_min, self.tz) if time_min else time.time()
+        upper = parse_time(time_max, self.tz) if time_max else None
+
+        with self._lock:
+            # Event bắt đầu trước lower - max_duration chắc chắn đã kết thúc trước lower
+            index = bisect.bisect_left(self._starts, (lower - self._max_duration, ""))
+            results = []
+            for start, event_id in self._starts[index:]:
+                if upper is not None and start >= upper:
+                    break
+                event = self._events[event_id]
+                if self._end(event, start) <= lower:
+                    continue
+                results.append(event)
+                if max_results and len(results) >= max_results:
+                    break
+            return results
+
+    def ensure_fresh(self):
+        if time.monotonic() - self.last_sync >= self.sync_interval or self.sync_token is None:
+            self.sync()
+
+    def sync(self):
+        """Sync incremental nếu có token, nếu không (hoặc token hết hạn) thì full sync."""
+        with self._lock:
+            if self.sync_token:
+                try:
+                    self._sync(self.sync_token)
+                    return
+                except HttpError as e:
+                    if getattr(e.resp, "status", None) != 410:
+                        raise
+                    logging.info("Calendar sync token expired, running full resync")
+            self._sync(None)
+
+    def upsert(self, event: dict):
+        """Cập nhật ngay event vừa tạo / sửa, không chờ lần sync sau."""
+        with self._lock:
+            self._apply(event)
+            self._save()
+
+    def remove(self, event_id: str):
+        with self._lock:
+            self._apply({"id": event_id, "status": "cancelled"})
+            self._save()
+
+    def _sync(self, sync_token: str | None):
+        if sync_token is None:
+            self._events = {}
+            self._starts = []
+            self._max_duration = 0.0
+
+        params = {"calendarId": self.calendar_id, "singleEvents": True, "showDeleted": sync_token is not None, "timeZone": self.timezone}
+        if sync_token:
+            params["syncToken"] = sync_token
+        page_token = None
+        changed = 0
+        while True:
+            if page_token:
+                params["pageToken"] = page_token
+            request = self.service.events().list(**params)
+            response = request.execute(http=self.http()) if self.http else request.execute()
+            for event in response.get("items", []):
+                self._apply(event)
+                changed += 1
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        self.sync_token = response.get("nextSyncToken")
+        self.last_sync = time.monotonic()
+        if changed or sync_token is None:
+            self._save()
+        logging.info(f"Calendar {'incremental' if sync_token else 'full'} sync: {changed} change(s)")
+
+    def _apply(self, event: dict):
+        event_id = event["id"]
+        old = self._events.pop(event_id, None)
+        if old is not None:
+            old_start = parse_time(old.get("start"), self.tz)
+            index = bisect.bisect_left(self._starts, (old_start, event_id))
+            if index < len(self._starts) and self._starts[index] == (old_start, event_id):
+                del self._starts[index]
+
+        if event.get("status") == "cancelled":
+            return
+        start = parse_time(event.get("start"), self.tz)
+        if start is None:
+            return
+        self._events[event_id] = event
+        bisect.insort(self._starts, (start, event_id))
+        # max_duration chỉ tăng; xoá event dài không làm truy vấn sai, chỉ quét rộng hơn
+        self._max_duration = max(self._max_duration, self._end(event, start) - start)
+
+    def _end(self, event: dict, start: float) -> float:
+        end = parse_time(event.get("end"), self.tz)
+        return end if end is not None else start
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable calendar cache {self.path}: {e}")
+            return
+        if data.get("calendar_id") != self.calendar_id:
+            return
+        for event in data.get("events", []):
+            self._apply(event)
+        self.sync_token = data.get("sync_token")
+
+    def _save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        data = {"calendar_id": self.calendar_id, "sync_token": self.sync_token, "events": list(self._events.values())}
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
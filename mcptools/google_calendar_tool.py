@@ -1,16 +1,22 @@
 import logging
+import threading
+import httplib2
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import datetime
 import os
 from dotenv import load_dotenv
+from mcptools.calendar_cache import CalendarEventCache
 
 load_dotenv()
 
 SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 CALENDAR_ID = os.getenv("EMAIL_USER", "primary")
+# Giới hạn số request trong một batch của Calendar API
+CALENDAR_BATCH_SIZE = 50
 
 
 logging.basicConfig(level=logging.INFO)
@@ -23,9 +29,31 @@ class GoogleCalendarTool:
         self.creds = service_account.Credentials.from_service_account_file(
             SERVICE_ACCOUNT_FILE, scopes=SCOPES
         )
-        self.service = build("calendar", "v3", credentials=self.creds)
+        # Discovery document đi kèm googleapiclient, không tải qua mạng khi khởi động
+        self.service = build("calendar", "v3", credentials=self.creds, static_discovery=True)
+        self._local = threading.local()
+        # Bản sao local sync bằng syncToken, phục vụ list_upcoming_events không cần gọi API mỗi lần
+        self.cache = CalendarEventCache(self.service, CALENDAR_ID, http=self.http)
+
+    def http(self) -> AuthorizedHttp:
+        """
+        Transport riêng cho thread hiện tại: httplib2.Http không thread-safe,
+        còn tool được gọi song song từ thread pool của server. Mọi execute()
+        phải truyền http=self.http() thay vì dùng transport chung của service.
+        """
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.creds, http=httplib2.Http())
+        return http
 
     def list_upcoming_events(self, max_results=None, time_max=None, time_min=None):
+        try:
+            return self.cache.query(time_min=time_min, time_max=time_max, max_results=max_results)
+        except Exception as e:
+            logging.warning(f"Calendar cache unavailable, querying API directly: {e}")
+        return self.fetch_upcoming_events(max_results, time_max, time_min)
+
+    def fetch_upcoming_events(self, max_results=None, time_max=None, time_min=None):
         try:
             now = datetime.datetime.now(datetime.UTC).isoformat()
             params = {"calendarId": CALENDAR_ID, "singleEvents": True, "orderBy": "startTime", "timeZone":"Asia/Ho_Chi_Minh",}
@@ -37,7 +65,7 @@ class GoogleCalendarTool:
                 params["timeMax"] = time_max
             if max_results:
                 params["maxResults"] = max_results
-            events_result = self.service.events().list(**params).execute()
+            events_result = self.service.events().list(**params).execute(http=self.http())
             events = events_result.get("items", [])
             return events
         except HttpError as e:
@@ -49,8 +77,9 @@ class GoogleCalendarTool:
         
     def quick_add_event(self, text):
         try: 
-            created_event = self.service.events().quickAdd(calendarId=CALENDAR_ID, text=text).execute()
+            created_event = self.service.events().quickAdd(calendarId=CALENDAR_ID, text=text).execute(http=self.http())
             logging.info(f"Event created: {created_event.get('htmlLink')}")
+            self.cache.upsert(created_event)
         except HttpError as e:
             logging.error("API call failed with HTTP error:", e)
         except Exception as e:
@@ -59,22 +88,10 @@ class GoogleCalendarTool:
         
     def insert_event(self, summary: str, location: str, description: str, start_datetime: str, end_datetime: str, attendees: list[str] = []):
         try:
-            event = {
-                "summary": summary,
-                "location": location,
-                "description": description,
-                "start": {
-                    "dateTime": start_datetime,
-                    "timeZone": "UTC",
-                },
-                "end": {
-                    "dateTime": end_datetime,
-                    "timeZone": "UTC",
-                },
-                "attendees": attendees,
-            }
-            created_event = self.service.events().insert(calendarId=CALENDAR_ID, body=event).execute()
+            event = self.build_event(summary, location, description, start_datetime, end_datetime, attendees)
+            created_event = self.service.events().insert(calendarId=CALENDAR_ID, body=event).execute(http=self.http())
             logging.info(f"Event created: {created_event.get('htmlLink')}")
+            self.cache.upsert(created_event)
             return created_event
         except HttpError as e:
             logging.error("API call failed with HTTP error:", e)
@@ -82,4 +99,65 @@ class GoogleCalendarTool:
         except Exception as e:
             logging.error("Unexpected error:", e)
             return None
-        
\ No newline at end of file
+
+    def insert_events(self, events: list[dict]) -> list[dict]:
+        """
+        Tạo nhiều event bằng batch request của Google API (tối đa 50 event / HTTP request).
+
+        Mỗi phần tử của events có summary, start, end (ISO) và tuỳ chọn
+        location, description, attendees.
+        Trả về kết quả theo đúng thứ tự đầu vào; lỗi của một event không ảnh hưởng các event khác.
+        """
+        results: list[dict | None] = [None] * len(events)
+        bodies = {}
+        for index, item in enumerate(events):
+            try:
+                bodies[index] = self.build_event(
+                    item.get("summary", ""), item.get("location", ""), item.get("description", ""),
+                    item["start"], item["end"], item.get("attendees") or [],
+                )
+            except KeyError as e:
+                results[index] = {"index": index, "status": "error", "error": f"missing {e.args[0]}"}
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                results[index] = {"index": index, "status": "error", "error": str(exception)}
+                return
+            self.cache.upsert(response)
+            results[index] = {"index": index, "status": "success", "id": response.get("id"), "htmlLink": response.get("htmlLink")}
+
+        pending = list(bodies.items())
+        for chunk_start in range(0, len(pending), CALENDAR_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index, body in pending[chunk_start:chunk_start + CALENDAR_BATCH_SIZE]:
+                batch.add(self.service.events().insert(calendarId=CALENDAR_ID, body=body), request_id=str(index))
+            try:
+                batch.execute(http=self.http())
+            except Exception as e:
+                logging.error(f"Calendar batch insert failed: {e}")
+                for index, _ in pending[chunk_start:chunk_start + CALENDAR_BATCH_SIZE]:
+                    if results[index] is None:
+                        results[index] = {"index": index, "status": "error", "error": str(e)}
+
+        created = sum(r["status"] == "success" for r in results)
+        logging.info(f"Batch created {created}/{len(events)} events")
+        return results
+
+    @staticmethod
+    def build_event(summary: str, location: str, description: str, start_datetime: str, end_datetime: str, attendees: list = []) -> dict:
+        return {
+            "summary": summary,
+            "location": location,
+            "description": description,
+            "start": {
+                "dateTime": start_datetime,
+                "timeZone": "UTC",
+            },
+            "end": {
+                "dateTime": end_datetime,
+                "timeZone": "UTC",
+            },
+            # Calendar API cần [{"email": ...}], chấp nhận cả list email dạng chuỗi
+            "attendees": [{"email": a} if isinstance(a, str) else a for a in attendees],
+        }
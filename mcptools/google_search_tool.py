@@ -2,12 +2,16 @@ from dotenv import load_dotenv
 import os
 import httpx
 import json
+from mcptools.http_client import ManagedHTTPClient
 
 load_dotenv()
 
 SERPER_URL="https://google.serper.dev/search"
 SERPER_API_KEY=os.getenv("SERPER_API_KEY")
 
+# Client dùng chung: giữ kết nối tới Serper và gộp các query trùng nhau
+http_client = ManagedHTTPClient(timeout=30.0)
+
 async def search_web(query: str, num: int = 3) -> str:
     payload = json.dumps({"q": query, "num": num})
     headers = {
@@ -15,16 +19,15 @@ async def search_web(query: str, num: int = 3) -> str:
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                SERPER_URL, headers=headers, data=payload, timeout=30.0
-            )
-            response.raise_for_status()
-            results = response.json()
-        except httpx.TimeoutException:
-            return "Timeout error."
-    
+    try:
+        response = await http_client.post(
+            SERPER_URL, headers=headers, content=payload, coalesce_key=("search", query, num)
+        )
+        response.raise_for_status()
+        results = response.json()
+    except httpx.TimeoutException:
+        return "Timeout error."
+
     if not results or len(results.get("organic", [])) == 0:
         return "No results found."
 
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import random
+from typing import Any, Hashable
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Lỗi kết nối đáng thử lại; read timeout thì không (đã chờ đủ lâu rồi)
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.ReadError)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ManagedHTTPClient:
+    """
+    httpx.AsyncClient dùng chung cho cả process.
+
+    - Connection pool + keep-alive nên không phải bắt tay TCP/TLS cho mỗi request.
+    - HTTP/2 nếu có cài `h2` (HTTP2_ENABLED=1).
+    - Request có coalesce_key giống nhau đang bay sẽ dùng chung một response.
+    - Retry có giới hạn với backoff ngẫu nhiên (full jitter) khi gặp 429/5xx
+      hoặc lỗi kết nối; tôn trọng header Retry-After.
+    """
+
+    def __init__(self, timeout: float = 30.0, max_retries: int = HTTP_MAX_RETRIES, backoff_base: float = 0.5, backoff_max: float = 8.0, http2: bool = HTTP2_ENABLED):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http2 = http2 and _http2_available()
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # AsyncClient gắn với event loop tạo ra nó
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._loop = loop
+            self._inflight = {}
+        return self._client
+
+    async def request(self, method: str, url: str, coalesce_key: Hashable | None = None, **kwargs: Any) -> httpx.Response:
+        if coalesce_key is None:
+            return await self._request_with_retry(method, url, **kwargs)
+
+        client = self.client  # đảm bảo _inflight thuộc loop hiện tại
+        inflight = self._inflight.get(coalesce_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.ensure_future(self._request_with_retry(method, url, client=client, **kwargs))
+        self._inflight[coalesce_key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(coalesce_key) is future:
+                del self._inflight[coalesce_key]
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request_with_retry(self, method: str, url: str, client: httpx.AsyncClient | None = None, **kwargs: Any) -> httpx.Response:
+        client = client or self.client
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.request(method, url, **kwargs)
+            except RETRY_EXCEPTIONS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(f"{method} {url} failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+            delay = self._retry_after(response) or self._backoff(attempt)
+            logging.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry_after(self, response: httpx.Response) -> float | None:
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return min(float(value), self.backoff_max)
+        except ValueError:
+            return None
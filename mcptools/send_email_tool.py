@@ -1,11 +1,13 @@
 
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.header import decode_header, make_header
 import logging
 from typing import List, Dict
 import os
 from dotenv import load_dotenv
+from mcptools.smtp_pool import SMTPConnectionPool
 
 load_dotenv()
 
@@ -13,6 +15,10 @@ EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASS = os.getenv("EMAIL_PASS")
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+# SMTP_STARTTLS=0 khi thử với server SMTP local (vd. aiosmtpd) không có TLS
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 2))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))
 
 
 
@@ -30,37 +36,68 @@ class EmailTool:
                 "EMAIL_USER hoặc EMAIL_PASS chưa được set. "
                 "Vui lòng điền vào .env hoặc biến môi trường."
             )
+        # Giữ phiên SMTP đã đăng nhập để không phải connect/STARTTLS/login cho mỗi email
+        self.pool = SMTPConnectionPool(self.connect_smtp, max_size=SMTP_POOL_SIZE, idle_timeout=SMTP_IDLE_TIMEOUT)
     
 
     def connect_smtp(self):
         server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-        server.starttls()
-        server.login(self.user, self.password)
+        if SMTP_STARTTLS:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
         return server
 
+    def build_message(self, to_addresses: List[str], subject: str, body: str) -> str:
+        msg = MIMEText(body, 'plain', 'utf-8')
+        msg['Subject'] = make_header(decode_header(subject))
+        msg['From'] = self.user
+        msg['To'] = ', '.join(to_addresses)
+        return msg.as_string()
+
     def send_text_email(self, to_addresses: List[str], subject: str, body: str) -> Dict[str, str]:
         if not isinstance(to_addresses, list) or not to_addresses:
             raise ValueError("Input 'to_addresses' must be a non-empty list.")
 
-      
-
-        server = None
         try:
-            msg = MIMEText(body, 'plain', 'utf-8')
-            msg['Subject'] = make_header(decode_header(subject))
-            msg['From'] = self.user
-            msg['To'] = ', '.join(to_addresses)
-
-            server = self.connect_smtp()
-            server.sendmail(self.user, to_addresses, msg.as_string())
+            self.pool.sendmail(self.user, to_addresses, self.build_message(to_addresses, subject, body))
             logging.info(f"Text email sent successfully to {', '.join(to_addresses)}")
             return {"status": "success"}
         except Exception as e:
             logging.error(f"send_text_email failed: {e}")
             raise
-        finally:
-            if server:
-                try:
-                    server.quit()
-                except Exception as e:
-                    logging.warning(f"Error closing SMTP connection: {e}")
+
+    def send_bulk_email(self, messages: List[Dict]) -> List[Dict[str, str]]:
+        """
+        Gửi nhiều email riêng lẻ qua các kết nối trong pool.
+
+        Mỗi phần tử của messages có "to_addresses" (list), "subject" và "body".
+        Lỗi của một email không làm dừng các email khác.
+        """
+        if not isinstance(messages, list) or not messages:
+            raise ValueError("Input 'messages' must be a non-empty list.")
+
+        def send_one(item: Dict) -> Dict[str, str]:
+            to_addresses = list(item.get("to_addresses") or [])
+            result = {"to": ', '.join(to_addresses)}
+            try:
+                if not to_addresses:
+                    raise ValueError("missing 'to_addresses'")
+                message = self.build_message(to_addresses, item.get("subject", ""), item.get("body", ""))
+                refused = self.pool.sendmail(self.user, to_addresses, message)
+                if refused:
+                    return {**result, "status": "partial", "refused": ', '.join(refused)}
+                return {**result, "status": "success"}
+            except Exception as e:
+                logging.warning(f"send_bulk_email failed for {result['to']}: {e}")
+                return {**result, "status": "error", "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=min(self.pool.max_size, len(messages))) as workers:
+            results = list(workers.map(send_one, messages))
+        sent = sum(r["status"] == "success" for r in results)
+        logging.info(f"Bulk email: {sent}/{len(results)} sent")
+        return results
+
+    def close(self):
+        self.pool.close_all()
+
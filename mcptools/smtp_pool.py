@@ -0,0 +1,123 @@
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """
+    Lỗi cho thấy kết nối đã hỏng, nên bỏ kết nối và thử lại với kết nối mới.
+    SMTPException kế thừa OSError nhưng phần lớn là lỗi ở mức message
+    (vd. recipient bị từ chối), khi đó kết nối vẫn dùng tiếp được.
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPConnectionPool:
+    """
+    Pool các phiên SMTP đã STARTTLS + login sẵn, dùng an toàn từ nhiều thread.
+
+    Kết nối rảnh quá idle_timeout giây bị đóng; kết nối rảnh quá
+    noop_after giây được kiểm tra bằng NOOP trước khi dùng lại. Nếu server
+    ngắt kết nối giữa chừng, `sendmail` tự kết nối lại và gửi lại một lần.
+    """
+
+    def __init__(self, connect: Callable[[], smtplib.SMTP], max_size: int = 4, idle_timeout: float = 60.0, noop_after: float = 10.0):
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self._idle: List[tuple[smtplib.SMTP, float]] = []
+        self._open = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> smtplib.SMTP:
+        while True:
+            with self._condition:
+                while not self._idle and self._open >= self.max_size:
+                    self._condition.wait()
+                if self._idle:
+                    server, last_used = self._idle.pop()
+                else:
+                    self._open += 1
+                    server, last_used = None, None
+
+            if server is None:
+                try:
+                    return self.connect()
+                except Exception:
+                    self._forget()
+                    raise
+
+            idle_for = time.monotonic() - last_used
+            if idle_for < self.noop_after:
+                return server
+            if idle_for < self.idle_timeout and self._is_healthy(server):
+                return server
+            self.discard(server)
+
+    def release(self, server: smtplib.SMTP):
+        with self._condition:
+            self._idle.append((server, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+        self._forget()
+
+    @contextmanager
+    def connection(self):
+        server = self.acquire()
+        try:
+            yield server
+        except Exception as e:
+            if is_connection_error(e):
+                self.discard(server)
+            else:
+                self.release(server)
+            raise
+        else:
+            self.release(server)
+
+    def sendmail(self, from_addr: str, to_addrs: List[str], msg: str):
+        try:
+            with self.connection() as server:
+                return server.sendmail(from_addr, to_addrs, msg)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            logging.warning(f"SMTP connection lost ({e}), reconnecting")
+            with self.connection() as server:
+                return server.sendmail(from_addr, to_addrs, msg)
+
+    def close_all(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self.discard(server)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {"open": self._open, "idle": len(self._idle), "max_size": self.max_size}
+
+    def _forget(self):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _is_healthy(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
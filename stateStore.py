@@ -0,0 +1,185 @@
+import copy
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict
+from langchain_core.messages import messages_to_dict, messages_from_dict
+
+AgentState = Dict[str, Any]
+
+# Số record trong journal trước khi gộp lại thành snapshot
+JOURNAL_COMPACT_EVERY = int(os.getenv("STATE_JOURNAL_COMPACT_EVERY", 200))
+
+# Các key không bao giờ được ghi xuống đĩa
+TRANSIENT_KEYS = ("system_prompt",)
+
+# Snapshot và journal cùng generation mới được replay cùng nhau
+GENERATION_KEY = "_journal_generation"
+
+
+class JournaledStateStore:
+    """
+    Append-only state store.
+
+    Layout trên đĩa:
+        <snapshot>          JSON đầy đủ của state tại lần compact gần nhất
+        <snapshot>.journal  mỗi dòng là một record JSON áp dụng lên snapshot
+
+    Record types:
+        {"op": "append", "messages": [...]}   thêm message mới
+        {"op": "drop", "count": n}             bỏ n message cũ nhất
+        {"op": "set", "key": k, "value": v}    cập nhật một field khác (summary, ...)
+
+    Mỗi lượt chỉ ghi phần thay đổi nên chi phí không phụ thuộc độ dài hội thoại.
+    Dòng cuối bị ghi dở (crash) bị cắt khỏi journal khi load.
+    """
+
+    def __init__(self, path: str | Path, compact_every: int = JOURNAL_COMPACT_EVERY):
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.compact_every = compact_every
+        self._message_ids: list[str] = []
+        self._fields: dict[str, Any] = {}
+        self._journal_records = 0
+        self._generation = 0
+
+    def load(self, initial_state: AgentState) -> AgentState:
+        raw = {}
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        messages = raw.pop("messages", [])
+        self._generation = raw.pop(GENERATION_KEY, 0)
+
+        self._journal_records = 0
+        if self.journal_path.exists():
+            valid_bytes = 0
+            torn = False
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("unterminated record")
+                        record = json.loads(line)
+                    except ValueError:
+                        # record cuối bị ghi dở khi crash
+                        torn = True
+                        break
+                    valid_bytes += len(line)
+                    if record.get("gen", 0) != self._generation:
+                        # journal cũ còn sót lại khi crash giữa lúc compact
+                        continue
+                    self._journal_records += 1
+                    op = record.get("op")
+                    if op == "append":
+                        messages.extend(record["messages"])
+                    elif op == "drop":
+                        messages = messages[record["count"]:]
+                    elif op == "set":
+                        raw[record["key"]] = record["value"]
+            if torn:
+                # Cắt phần ghi dở, nếu không record append sau sẽ dính vào dòng hỏng
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+
+        if not raw and not messages:
+            self._message_ids = [self._ensure_id(m) for m in initial_state.get("messages", [])]
+            self._fields = self._persistent_fields(initial_state)
+            return initial_state
+
+        state = {**initial_state, **raw, "messages": messages_from_dict(messages)}
+        for key in TRANSIENT_KEYS:
+            if key in initial_state:
+                state[key] = initial_state[key]
+
+        self._message_ids = [self._ensure_id(m) for m in state["messages"]]
+        self._fields = self._persistent_fields(state)
+        return state
+
+    def save(self, state: AgentState):
+        messages = list(state.get("messages", []))
+        ids = [self._ensure_id(m) for m in messages]
+        fields = self._persistent_fields(state)
+
+        # Các message đầu bị cắt bỏ (eviction) + message mới ở cuối
+        current = set(ids)
+        dropped = 0
+        while dropped < len(self._message_ids) and self._message_ids[dropped] not in current:
+            dropped += 1
+        kept = self._message_ids[dropped:]
+
+        if ids[:len(kept)] != kept or self._journal_records >= self.compact_every:
+            self.compact(state)
+            return
+
+        records = []
+        if dropped:
+            records.append({"op": "drop", "count": dropped})
+        new_messages = messages[len(kept):]
+        if new_messages:
+            records.append({"op": "append", "messages": messages_to_dict(new_messages)})
+        for key, value in fields.items():
+            if self._fields.get(key) != value:
+                records.append({"op": "set", "key": key, "value": value})
+
+        if records:
+            self._append(records)
+        self._message_ids = ids
+        self._fields = fields
+
+    def save_fields(self, fields: dict[str, Any]):
+        """Ghi các field khác messages (vd. summary nén xong ở background) mà không đụng tới message."""
+        records = [
+            {"op": "set", "key": key, "value": copy.deepcopy(value)}
+            for key, value in fields.items()
+            if key not in TRANSIENT_KEYS and self._fields.get(key) != value
+        ]
+        if records:
+            self._append(records)
+            self._fields.update({r["key"]: r["value"] for r in records})
+
+    def compact(self, state: AgentState):
+        """Ghi snapshot mới (atomic) và xoá journal."""
+        serializable_state = self._persistent_fields(state)
+        serializable_state["messages"] = messages_to_dict(list(state.get("messages", [])))
+        serializable_state[GENERATION_KEY] = self._generation + 1
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(serializable_state, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+
+        self._message_ids = [self._ensure_id(m) for m in state.get("messages", [])]
+        self._fields = self._persistent_fields(state)
+        self._journal_records = 0
+        self._generation += 1
+
+    def _append(self, records: list[dict]):
+        for record in records:
+            record["gen"] = self._generation
+        lines = "".join(
+            json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records
+        )
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+        self._journal_records += len(records)
+
+    @staticmethod
+    def _persistent_fields(state: AgentState) -> dict:
+        return {
+            k: copy.deepcopy(v) for k, v in state.items()
+            if k != "messages" and k not in TRANSIENT_KEYS
+        }
+
+    @staticmethod
+    def _ensure_id(message) -> str:
+        if not message.id:
+            message.id = str(uuid.uuid4())
+        return message.id
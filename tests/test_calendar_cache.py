@@ -0,0 +1,123 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from mcptools.calendar_cache import CalendarEventCache
+
+
+class FakeRequest:
+    def __init__(self, run):
+        self.run = run
+
+    def execute(self, http=None):
+        return self.run()
+
+
+class FakeCalendarService:
+    """Calendar API giả: mỗi thay đổi tăng version, syncToken = version tại lúc sync."""
+
+    def __init__(self, page_size: int = 2):
+        self.page_size = page_size
+        self.store: dict[str, dict] = {}
+        self.changed_at: dict[str, int] = {}
+        self.version = 0
+        self.expired_tokens: set[str] = set()
+        self.requests: list[dict] = []
+
+    def put(self, event_id: str, start: str, end: str, **fields):
+        self.version += 1
+        self.store[event_id] = {"id": event_id, "status": "confirmed", "start": {"dateTime": start}, "end": {"dateTime": end}, **fields}
+        self.changed_at[event_id] = self.version
+
+    def cancel(self, event_id: str):
+        self.version += 1
+        self.store[event_id] = {"id": event_id, "status": "cancelled"}
+        self.changed_at[event_id] = self.version
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        return FakeRequest(lambda: self._list(params))
+
+    def _list(self, params: dict) -> dict:
+        self.requests.append(dict(params))
+        token = params.get("syncToken")
+        if token in self.expired_tokens:
+            raise HttpError(httplib2.Response({"status": 410}), b"Sync token is no longer valid")
+        since = int(token) if token else 0
+        items = [
+            event for event_id, event in sorted(self.store.items())
+            if self.changed_at[event_id] > since and (token or event["status"] != "cancelled")
+        ]
+        offset = int(params.get("pageToken") or 0)
+        page = items[offset:offset + self.page_size]
+        if offset + self.page_size < len(items):
+            return {"items": page, "nextPageToken": str(offset + self.page_size)}
+        return {"items": page, "nextSyncToken": str(self.version)}
+
+
+@pytest.fixture
+def service():
+    service = FakeCalendarService()
+    service.put("a", "2025-05-01T09:00:00+07:00", "2025-05-01T10:00:00+07:00", summary="standup")
+    service.put("b", "2025-05-01T13:00:00+07:00", "2025-05-01T14:00:00+07:00", summary="review")
+    service.put("c", "2025-05-02T09:00:00+07:00", "2025-05-02T17:00:00+07:00", summary="workshop")
+    return service
+
+
+def summaries(events: list[dict]) -> list[str]:
+    return [event["summary"] for event in events]
+
+
+def test_incremental_sync_only_fetches_changes(service, tmp_path):
+    cache = CalendarEventCache(service, "primary", path=tmp_path / "cache.json", sync_interval=0)
+    cache.sync()
+    assert cache.sync_token == "3"
+    assert [(r.get("syncToken"), r.get("pageToken")) for r in service.requests] == [(None, None), (None, "2")]
+
+    service.put("d", "2025-05-01T15:00:00+07:00", "2025-05-01T16:00:00+07:00", summary="1:1")
+    service.cancel("a")
+    service.requests.clear()
+    cache.sync()
+
+    assert [r.get("syncToken") for r in service.requests] == ["3"]
+    day = cache.query("2025-05-01T00:00:00+07:00", "2025-05-02T00:00:00+07:00")
+    assert summaries(day) == ["review", "1:1"]
+
+
+def test_expired_sync_token_triggers_full_resync(service, tmp_path):
+    cache = CalendarEventCache(service, "primary", path=tmp_path / "cache.json")
+    cache.sync()
+    service.expired_tokens.add(cache.sync_token)
+    service.cancel("b")
+    service.requests.clear()
+
+    cache.sync()
+
+    assert [r.get("syncToken") for r in service.requests] == ["3", None]
+    assert cache.sync_token == "4"
+    assert summaries(cache.query("2025-05-01T00:00:00+07:00")) == ["standup", "workshop"]
+
+
+def test_state_is_restored_from_disk(service, tmp_path):
+    CalendarEventCache(service, "primary", path=tmp_path / "cache.json").sync()
+
+    restored = CalendarEventCache(service, "primary", path=tmp_path / "cache.json")
+
+    assert restored.sync_token == "3"
+    assert len(restored._events) == 3
+
+
+def test_query_returns_events_overlapping_the_window(service, tmp_path):
+    cache = CalendarEventCache(service, "primary", path=None, sync_interval=3600)
+    cache.sync()
+
+    # workshop bắt đầu trước time_min nhưng vẫn đang diễn ra
+    assert summaries(cache.query("2025-05-02T12:00:00+07:00", "2025-05-03T00:00:00+07:00")) == ["workshop"]
+    # event kết thúc đúng tại time_min không thuộc cửa sổ
+    assert summaries(cache.query("2025-05-01T10:00:00+07:00", "2025-05-01T13:00:00+07:00")) == []
+    # time_max loại trừ event bắt đầu đúng tại đó
+    assert summaries(cache.query("2025-05-01T00:00:00+07:00", "2025-05-01T13:00:00+07:00")) == ["standup"]
+    # thời gian không có múi giờ được hiểu theo timezone của cache
+    assert summaries(cache.query("2025-05-01T13:30:00", "2025-05-01T13:45:00")) == ["review"]
+    assert summaries(cache.query("2025-05-01T00:00:00+07:00", max_results=2)) == ["standup", "review"]
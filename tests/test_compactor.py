@@ -0,0 +1,59 @@
+import asyncio
+from langchain_core.messages import AIMessage, HumanMessage
+from compactor import ConversationCompactor
+
+
+class SlowModel:
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def ainvoke(self, messages, config=None):
+        await self.release.wait()
+        return AIMessage(content="summary")
+
+
+def test_forget_clears_session_once_compaction_is_done():
+    async def scenario():
+        model = SlowModel()
+        compactor = ConversationCompactor(model)
+        compactor.submit("s1", [HumanMessage(content="hello"), AIMessage(content="hi")])
+        await asyncio.sleep(0)
+
+        busy = compactor.forget("s1")
+        model.release.set()
+        await compactor.drain()
+        summary = compactor.summary("s1")
+        return busy, summary, compactor.forget("s1"), compactor.levels("s1"), compactor._locks
+
+    busy, summary, forgotten, levels, locks = asyncio.run(scenario())
+    assert busy is False
+    assert summary == "summary"
+    assert forgotten is True
+    assert levels == [] and locks == {}
+
+
+def test_summary_is_persisted_when_compaction_finishes(tmp_path):
+    from stateStore import JournaledStateStore
+
+    store = JournaledStateStore(tmp_path / "state.json")
+    history = [HumanMessage(content="my name is Lan"), AIMessage(content="hi Lan"), HumanMessage(content="next")]
+    store.save({"messages": history, "summary": "", "summary_levels": []})
+
+    async def scenario():
+        model = SlowModel()
+        compactor = ConversationCompactor(
+            model,
+            on_update=lambda session_id, summary, levels: store.save_fields({"summary": summary, "summary_levels": levels}),
+        )
+        # Lượt đã lưu việc drop + summary cũ trước khi nén xong
+        compactor.submit("default", history[:2])
+        store.save({"messages": history[2:], "summary": compactor.summary("default"), "summary_levels": []})
+        model.release.set()
+        await compactor.drain()
+
+    asyncio.run(scenario())
+
+    reloaded = JournaledStateStore(tmp_path / "state.json").load({"messages": [], "summary": "", "summary_levels": []})
+    assert [m.content for m in reloaded["messages"]] == ["next"]
+    assert reloaded["summary"] == "summary"
+    assert reloaded["summary_levels"] == [["summary"]]
@@ -0,0 +1,80 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from contextBuilder import ContextBuilder
+
+
+def tool_turn(question: str, result: str, call_id: str) -> list:
+    return [
+        HumanMessage(content=question),
+        AIMessage(content="", tool_calls=[{"name": "search", "args": {"q": question}, "id": call_id}]),
+        ToolMessage(content=result, tool_call_id=call_id),
+        AIMessage(content="done"),
+    ]
+
+
+def test_current_turn_is_kept_and_tool_results_are_truncated():
+    history = [*tool_turn("old", "x" * 400, "a"), *tool_turn("new", "y" * 20_000, "b")]
+    original = history[-2].content
+
+    context = ContextBuilder(token_budget=500).build(history, prefix=[SystemMessage(content="sys")])
+
+    assert [m.content for m in context[1:2] + context[5:6]] == ["old", "new"]
+    assert len(context) == 9
+    tool = context[7]
+    assert isinstance(tool, ToolMessage) and "[truncated" in tool.content
+    assert len(tool.content) < len(original)
+    assert history[-2].content == original
+
+
+def test_context_never_starts_on_ai_or_tool_message():
+    history = [
+        HumanMessage(content="q" * 4000),
+        AIMessage(content="", tool_calls=[{"name": "search", "args": {}, "id": "a"}]),
+        ToolMessage(content="r" * 40, tool_call_id="a"),
+        AIMessage(content="answer"),
+        HumanMessage(content="next"),
+    ]
+
+    context = ContextBuilder(token_budget=100).build(history)
+
+    assert [m.content for m in context] == ["next"]
+
+
+def test_older_turns_fill_remaining_budget():
+    history = [HumanMessage(content="hi"), AIMessage(content="hello"), HumanMessage(content="again")]
+
+    context = ContextBuilder(token_budget=1000).build(history)
+
+    assert [m.content for m in context] == ["hi", "hello", "again"]
+
+
+def test_split_returns_exactly_the_dropped_prefix():
+    history = [
+        HumanMessage(content="a" * 2000),
+        AIMessage(content="b" * 2000),
+        HumanMessage(content="hi"),
+        AIMessage(content="", tool_calls=[{"name": "search", "args": {}, "id": "c"}]),
+        ToolMessage(content="r", tool_call_id="c"),
+        AIMessage(content="hello"),
+        HumanMessage(content="again"),
+    ]
+
+    context, dropped = ContextBuilder(token_budget=200).split(history)
+
+    assert dropped == history[:2]
+    assert context == history[2:]
+
+
+def test_large_tool_result_does_not_evict_recent_history():
+    history = []
+    for i in range(6):
+        history += [HumanMessage(content=f"question {i} " + "q" * 400), AIMessage(content=f"answer {i} " + "a" * 400)]
+    history += tool_turn("what is on my calendar?", "e" * 60_000, "cal")
+    builder = ContextBuilder(token_budget=8000)
+
+    context, dropped = builder.split(history, prefix=[SystemMessage(content="sys")])
+
+    assert dropped == []
+    assert context[1:13] == history[:12]
+    tool = next(m for m in context if isinstance(m, ToolMessage))
+    assert builder.count(tool) <= 8000 * 0.25
+    assert sum(builder.count(m) for m in context) <= 8000
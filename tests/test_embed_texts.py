@@ -0,0 +1,30 @@
+import asyncio
+import threading
+from tools import updateUserFact
+
+
+def test_embed_texts_keeps_cache_io_off_the_event_loop(monkeypatch):
+    cache_threads = []
+
+    class RecordingCache:
+        def get_many(self, texts):
+            cache_threads.append(threading.get_ident())
+            return [None if t == "new" else [1.0] for t in texts]
+
+        def put_many(self, texts, vectors):
+            cache_threads.append(threading.get_ident())
+
+    class FakeWorker:
+        async def encode(self, texts):
+            return [[2.0] for _ in texts]
+
+    monkeypatch.setattr(updateUserFact, "embedding_cache", RecordingCache())
+    monkeypatch.setattr(updateUserFact, "embedding_worker", FakeWorker())
+
+    async def scenario():
+        return threading.get_ident(), await updateUserFact.embed_texts(["old", "new"])
+
+    loop_thread, vectors = asyncio.run(scenario())
+    assert vectors == [[1.0], [2.0]]
+    assert len(cache_threads) == 2
+    assert loop_thread not in cache_threads
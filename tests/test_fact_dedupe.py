@@ -0,0 +1,48 @@
+import chromadb
+import numpy as np
+from tools import updateUserFact
+from tools.factMaintenance import find_duplicates
+
+
+def unit(*values) -> list[float]:
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+VU = unit(1.0, 0.0, 0.0)
+AN = unit(1.0, 0.03, 0.0)  # cosine ~0.9995 với VU: câu gần như giống hệt
+
+
+def test_find_duplicates_keeps_facts_about_different_people():
+    metadatas = [
+        {"category": "profile", "name": "Vũ", "type": "email", "created_at": 1},
+        {"category": "profile", "name": "An", "type": "email", "created_at": 2},
+        {"category": "profile", "name": "An", "type": "email", "created_at": 3},
+    ]
+
+    assert find_duplicates(["vu", "an-old", "an-new"], metadatas, [VU, AN, AN]) == ["an-old"]
+
+
+def test_stored_fact_of_another_person_is_not_overwritten(tmp_path, monkeypatch):
+    collection = chromadb.PersistentClient(path=str(tmp_path / "chroma")).create_collection("user_facts")
+    collection.add(
+        ids=["vu-email", "general"],
+        documents=["Email của Vũ là vu@example.com", "Email là a@example.com"],
+        metadatas=[
+            {"category": "profile", "name": "Vũ", "type": "email", "created_at": 1.0},
+            {"category": "profile", "created_at": 1.0},
+        ],
+        embeddings=[VU, AN],
+    )
+    monkeypatch.setattr(updateUserFact, "_facts_collection", collection)
+    monkeypatch.setattr(updateUserFact, "FACT_INDEX_BACKEND", "chroma")
+
+    metadatas = [
+        {"category": "profile", "name": "An", "type": "email", "created_at": 2.0},
+        {"category": "profile", "name": "Vũ", "type": "email", "created_at": 2.0},
+    ]
+    ids = updateUserFact._dedupe_ids(["an-email", "vu-email-new"], metadatas, [AN, AN])
+
+    # An không ghi đè lên fact của Vũ (hay fact không có name); bản mới của Vũ thì có
+    assert ids == ["an-email", "vu-email"]
+    assert metadatas[1]["created_at"] == 1.0
@@ -0,0 +1,56 @@
+import chromadb
+from tools import updateUserFact
+from tools.factIndex import FactIndex
+
+
+def make_collection(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path / "chroma")).create_collection("user_facts")
+    collection.add(
+        ids=["email", "city"],
+        documents=["Email là a@example.com", "Sống ở Hà Nội"],
+        metadatas=[{"category": "profile", "created_at": 1.0}, {"category": "profile", "created_at": 1.0}],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]],
+    )
+    return collection
+
+
+def open_index(tmp_path, collection, monkeypatch):
+    monkeypatch.setattr(updateUserFact, "_facts_collection", collection)
+    monkeypatch.setattr(updateUserFact, "_fact_index", None)
+    monkeypatch.setattr(updateUserFact, "FACT_INDEX_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(updateUserFact, "FACT_INDEX_QUANTIZE", False)
+    return updateUserFact.get_fact_index()
+
+
+def test_index_is_rebuilt_when_chroma_changed_with_same_count(tmp_path, monkeypatch):
+    collection = make_collection(tmp_path)
+    open_index(tmp_path, collection, monkeypatch)
+
+    # Dedupe ghi đè lên id cũ: count không đổi nhưng nội dung thì đổi
+    collection.upsert(
+        ids=["email"],
+        documents=["Email là b@example.com"],
+        metadatas=[{"category": "profile", "created_at": 2.0}],
+        embeddings=[[1.0, 0.0]],
+    )
+    index = open_index(tmp_path, collection, monkeypatch)
+
+    assert index.query([[1.0, 0.0]], k=1) == [["Email là b@example.com"]]
+
+
+def test_metadata_update_only_rewrites_meta_json(tmp_path, monkeypatch):
+    collection = make_collection(tmp_path)
+    open_index(tmp_path, collection, monkeypatch)
+    monkeypatch.setattr(updateUserFact, "FACT_INDEX_BACKEND", "numpy")
+    vectors = tmp_path / "index" / "vectors.npy"
+    before = vectors.stat().st_mtime_ns, vectors.stat().st_ino
+
+    updateUserFact._update_metadata({"city": {"category": "profile", "created_at": 1.0, "last_used": 5.0}})
+
+    assert (vectors.stat().st_mtime_ns, vectors.stat().st_ino) == before
+    reopened = FactIndex(tmp_path / "index")
+    assert reopened.load()
+    assert reopened.metadatas[1]["last_used"] == 5.0
+    # Bản lưu vẫn khớp Chroma nên lần khởi động sau không phải dựng lại
+    index = open_index(tmp_path, collection, monkeypatch)
+    assert index.metadatas[1]["last_used"] == 5.0
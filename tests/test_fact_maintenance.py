@@ -0,0 +1,58 @@
+import time
+import chromadb
+import pytest
+from tools.factMaintenance import compact_collection, recover_collection, staging_name
+
+
+@pytest.fixture
+def client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+
+
+def add_facts(collection, count: int, **metadata):
+    collection.add(
+        ids=[f"f{i}" for i in range(count)],
+        documents=[f"fact {i}" for i in range(count)],
+        metadatas=[{"category": "general", "created_at": time.time(), **metadata} for _ in range(count)],
+        embeddings=[[1.0 if j == i else 0.0 for j in range(8)] for i in range(count)],
+    )
+
+
+def names(client) -> set[str]:
+    return {getattr(c, "name", c) for c in client.list_collections()}
+
+
+def test_finished_staging_is_restored_when_main_is_missing(client):
+    add_facts(client.create_collection(staging_name("user_facts")), 3)
+
+    assert recover_collection(client, "user_facts") is True
+
+    assert names(client) == {"user_facts"}
+    assert client.get_collection("user_facts").count() == 3
+
+
+def test_finished_staging_replaces_an_empty_main(client):
+    client.create_collection("user_facts")
+    add_facts(client.create_collection(staging_name("user_facts")), 2)
+
+    assert recover_collection(client, "user_facts") is True
+    assert client.get_collection("user_facts").count() == 2
+
+
+def test_partial_staging_is_dropped_when_main_is_intact(client):
+    add_facts(client.create_collection("user_facts"), 4)
+    add_facts(client.create_collection(staging_name("user_facts")), 1)
+
+    assert recover_collection(client, "user_facts") is False
+
+    assert names(client) == {"user_facts"}
+    assert client.get_collection("user_facts").count() == 4
+
+
+def test_compact_recovers_before_rebuilding(client):
+    add_facts(client.create_collection(staging_name("user_facts")), 3)
+
+    report = compact_collection(client)
+
+    assert report["before"] == 3 and report["after"] == 3
+    assert names(client) == {"user_facts"}
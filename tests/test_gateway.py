@@ -0,0 +1,56 @@
+import time
+from langchain_core.messages import AIMessage, HumanMessage
+import gateway
+from compactor import ConversationCompactor
+
+
+class FakeAgent:
+    def __init__(self):
+        self.compactor = ConversationCompactor(model=None)
+
+
+def make_manager(monkeypatch, saved):
+    monkeypatch.setattr(gateway, "load_state", lambda template: template)
+    monkeypatch.setattr(gateway, "save_state", saved.append)
+    monkeypatch.setattr(gateway, "release_state_store", lambda session_id: None)
+    return gateway.SessionManager(FakeAgent(), {"messages": [], "session_id": "default"}, idle_ttl=0)
+
+
+def test_evict_idle_persists_summary_and_forgets_session(monkeypatch):
+    saved = []
+    manager = make_manager(monkeypatch, saved)
+    session = manager.get("alice")
+    session.state["messages"] = [HumanMessage(content="hi"), AIMessage(content="hello")]
+    manager.agent.compactor.seed("alice", [["earlier chat"]])
+    session.last_used = time.monotonic() - 1
+
+    manager.evict_idle()
+
+    assert "alice" not in manager._sessions
+    assert manager.agent.compactor.levels("alice") == []
+    assert saved[-1]["summary_levels"] == [["earlier chat"]]
+    assert saved[-1]["summary"] == "earlier chat"
+
+
+def test_session_with_open_websocket_is_not_evicted(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    saved = []
+    manager = make_manager(monkeypatch, saved)
+    gateway.app.state.sessions = manager
+    client = TestClient(gateway.app)
+
+    with client.websocket_connect("/sessions/bob/ws"):
+        deadline = time.monotonic() + 2
+        while ("bob" not in manager._sessions or not manager._sessions["bob"].sockets) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        manager._sessions["bob"].last_used -= 1
+        manager.evict_idle()
+        assert "bob" in manager._sessions
+
+    deadline = time.monotonic() + 2
+    while manager._sessions["bob"].sockets and time.monotonic() < deadline:
+        time.sleep(0.01)
+    manager._sessions["bob"].last_used -= 1
+    manager.evict_idle()
+    assert "bob" not in manager._sessions
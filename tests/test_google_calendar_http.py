@@ -0,0 +1,62 @@
+import threading
+from google.oauth2.credentials import Credentials
+from mcptools.calendar_cache import CalendarEventCache
+from mcptools.google_calendar_tool import GoogleCalendarTool
+
+
+class FakeRequest:
+    def __init__(self, response, seen):
+        self.response = response
+        self.seen = seen
+
+    def execute(self, http=None):
+        self.seen.append(http)
+        return self.response
+
+
+class FakeService:
+    def __init__(self):
+        self.seen = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        return FakeRequest({"items": [], "nextSyncToken": "t1"}, self.seen)
+
+
+def make_tool() -> GoogleCalendarTool:
+    tool = GoogleCalendarTool.__new__(GoogleCalendarTool)
+    tool.creds = Credentials(token="token")
+    tool._local = threading.local()
+    return tool
+
+
+def test_each_thread_gets_its_own_http_transport():
+    tool = make_tool()
+    transports = []
+
+    def worker():
+        transports.append(tool.http())
+        transports.append(tool.http())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    per_thread = transports[0::2]
+    assert transports[0::2] == transports[1::2]
+    assert len({id(http) for http in per_thread}) == 3
+    assert len({id(http.http) for http in per_thread}) == 3
+
+
+def test_cache_sync_executes_with_the_thread_transport(tmp_path):
+    tool = make_tool()
+    service = FakeService()
+    cache = CalendarEventCache(service, "primary", path=tmp_path / "cache.json", http=tool.http)
+
+    cache.sync()
+
+    assert service.seen == [tool.http()]
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from mcptools.http_client import ManagedHTTPClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.hits[self.path] = hits = server.hits.get(self.path, 0) + 1
+
+        if self.path == "/drop" and hits == 1:
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        if self.path == "/flaky" and hits <= 2:
+            return self.reply(503, b"busy", {"Retry-After": "0"})
+        if self.path == "/slow":
+            time.sleep(1)
+        if self.path == "/shared":
+            time.sleep(0.2)
+        self.reply(200, b"ok")
+
+    def reply(self, status: int, body: bytes, headers: dict | None = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = set()
+    server.hits = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(client: ManagedHTTPClient, scenario):
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_sequential_requests_reuse_one_connection(server):
+    client = ManagedHTTPClient(http2=False)
+
+    async def scenario():
+        return [(await client.get(f"{server.url}/ok")).status_code for _ in range(5)]
+
+    assert run(client, scenario) == [200] * 5
+    assert server.hits["/ok"] == 5
+    assert len(server.connections) == 1
+
+
+def test_retryable_status_is_retried_until_success(server):
+    client = ManagedHTTPClient(http2=False, max_retries=3, backoff_base=0.01)
+
+    response = run(client, lambda: client.get(f"{server.url}/flaky"))
+
+    assert response.status_code == 200
+    assert server.hits["/flaky"] == 3
+
+
+def test_retries_are_bounded(server):
+    client = ManagedHTTPClient(http2=False, max_retries=1, backoff_base=0.01)
+
+    response = run(client, lambda: client.get(f"{server.url}/flaky"))
+
+    assert response.status_code == 503
+    assert server.hits["/flaky"] == 2
+
+
+def test_dropped_connection_is_retried(server):
+    client = ManagedHTTPClient(http2=False, backoff_base=0.01)
+
+    response = run(client, lambda: client.get(f"{server.url}/drop"))
+
+    assert response.status_code == 200
+    assert server.hits["/drop"] == 2
+
+
+def test_read_timeout_is_raised_without_retry(server):
+    client = ManagedHTTPClient(http2=False, timeout=0.2, backoff_base=0.01)
+
+    with pytest.raises(httpx.ReadTimeout):
+        run(client, lambda: client.get(f"{server.url}/slow"))
+    assert server.hits["/slow"] == 1
+
+
+def test_concurrent_requests_with_same_key_are_coalesced(server):
+    client = ManagedHTTPClient(http2=False)
+    url = f"{server.url}/shared"
+
+    async def scenario():
+        return await asyncio.gather(*(client.get(url, coalesce_key=url) for _ in range(5)))
+
+    responses = run(client, scenario)
+    assert [r.text for r in responses] == ["ok"] * 5
+    assert server.hits["/shared"] == 1
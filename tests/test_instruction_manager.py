@@ -0,0 +1,28 @@
+import asyncio
+from instruction import instructionManager
+from instruction.instructionManager import InstructionManager
+
+
+def test_concurrent_prompts_keep_their_own_tools(monkeypatch, tmp_path):
+    versions = iter(range(100))
+
+    async def slow_preferences(query, category):
+        await asyncio.sleep(0.01)
+        return ["likes tea"]
+
+    # Mỗi lần hỏi version là một version mới, nên không lượt nào trúng cache
+    monkeypatch.setattr(instructionManager, "fact_version", lambda category: next(versions))
+    monkeypatch.setattr(instructionManager, "aquery_user_facts", slow_preferences)
+    manager = InstructionManager(instruction_path=tmp_path)
+    calendar = [{"name": "list_upcoming_events", "description": "read the calendar"}]
+    email = [{"name": "send_email", "description": "send an email"}]
+
+    async def scenario():
+        return await asyncio.gather(manager.system_prompt(calendar), manager.system_prompt(email))
+
+    calendar_prompt, email_prompt = asyncio.run(scenario())
+    assert "list_upcoming_events" in calendar_prompt.content
+    assert "send_email" not in calendar_prompt.content
+    assert "send_email" in email_prompt.content
+    assert "list_upcoming_events" not in email_prompt.content
+    assert "likes tea" in email_prompt.content
@@ -0,0 +1,106 @@
+import asyncio
+import socket
+import subprocess
+import sys
+from mcpserver.mcp_client import MCPClient
+
+SERVER = '''
+import os
+from dotenv import load_dotenv
+from mcp.server.fastmcp import FastMCP
+
+load_dotenv()
+mcp = FastMCP("probe")
+
+@mcp.tool()
+def transport() -> str:
+    return os.environ["MCP_TRANSPORT"]
+
+if __name__ == "__main__":
+    mcp.run(transport=os.getenv("MCP_TRANSPORT", "stdio"))
+'''
+
+
+def test_stdio_server_runs_stdio_even_if_dotenv_says_sse(tmp_path, monkeypatch):
+    script = tmp_path / "probe_server.py"
+    script.write_text(SERVER, encoding="utf-8")
+    (tmp_path / ".env").write_text("MCP_TRANSPORT=sse\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MCP_TRANSPORT", "sse")
+
+    async def scenario():
+        client = MCPClient()
+        try:
+            await client.connect_to_server(str(script))
+            result = await client.session.call_tool("transport", {})
+            return result.content[0].text
+        finally:
+            await client.cleanup()
+
+    assert asyncio.run(asyncio.wait_for(scenario(), 30)) == "stdio"
+
+
+SSE_SERVER = '''
+import asyncio
+import sys
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("probe", host="127.0.0.1", port=int(sys.argv[1]))
+arrived = []
+both_arrived = asyncio.Event()
+
+@mcp.tool()
+async def rendezvous(caller: str) -> str:
+    # Chỉ trả về khi cả hai client đang gọi cùng lúc; server xử lý tuần tự thì sẽ timeout
+    arrived.append(caller)
+    if len(arrived) == 2:
+        both_arrived.set()
+    await asyncio.wait_for(both_arrived.wait(), 10)
+    return caller
+
+if __name__ == "__main__":
+    mcp.run(transport="sse")
+'''
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_two_sse_clients_call_a_tool_concurrently(tmp_path):
+    script = tmp_path / "sse_server.py"
+    script.write_text(SSE_SERVER, encoding="utf-8")
+    port = free_port()
+    server = subprocess.Popen([sys.executable, str(script), str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def wait_until_listening():
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                return
+            except OSError:
+                assert server.poll() is None, "SSE server exited"
+                await asyncio.sleep(0.1)
+
+    async def call(caller: str) -> str:
+        client = MCPClient()
+        try:
+            await client.connect_to_url(f"http://127.0.0.1:{port}/sse")
+            result = await client.session.call_tool("rendezvous", {"caller": caller})
+            return result.content[0].text
+        finally:
+            await client.cleanup()
+
+    async def scenario():
+        await wait_until_listening()
+        return await asyncio.gather(call("a"), call("b"))
+
+    try:
+        assert asyncio.run(asyncio.wait_for(scenario(), 30)) == ["a", "b"]
+    finally:
+        # uvicorn chờ đóng hết kết nối SSE khi tắt êm, test không cần điều đó
+        server.kill()
+        server.wait()
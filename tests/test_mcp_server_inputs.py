@@ -0,0 +1,39 @@
+import asyncio
+import json
+import pytest
+from mcpserver import mcp_server
+from tools.schemaCompiler import SchemaCompiler
+
+
+class FakeCalendar:
+    def __init__(self):
+        self.calls = []
+
+    def insert_events(self, events):
+        self.calls.append(events)
+        return [{"index": i, "status": "success"} for i in range(len(events))]
+
+
+def tool_schema(name: str) -> dict:
+    tools = asyncio.run(mcp_server.mcp.list_tools())
+    return next(tool.inputSchema for tool in tools if tool.name == name)
+
+
+def test_calendar_events_are_validated_and_passed_as_dicts(monkeypatch):
+    calendar = FakeCalendar()
+    monkeypatch.setattr(mcp_server.calendar_backend, "get", lambda: calendar)
+    event = {"summary": "Study", "start": "2025-05-01T10:00:00+07:00", "end": "2025-05-01T11:00:00+07:00"}
+
+    content = asyncio.run(mcp_server.mcp.call_tool("create_google_calendar_events", {"events": [event]}))
+
+    assert json.loads(content[0].text)["status"] == "success"
+    assert calendar.calls == [[{**event, "description": "", "location": "", "attendees": []}]]
+
+
+def test_calendar_event_input_compiles_to_a_typed_item_model():
+    model = SchemaCompiler().compile("create_google_calendar_events", tool_schema("create_google_calendar_events"))
+
+    args = model(events=[{"summary": "Study", "start": "s", "end": "e"}])
+    assert args.events[0].attendees == []
+    with pytest.raises(ValueError):
+        model(events=[{"summary": "Study"}])
@@ -0,0 +1,26 @@
+import pytest
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from tools.schemaCompiler import SchemaCompiler
+
+
+@pytest.mark.parametrize("array_schema", [{"type": "array"}, {"type": "array", "items": {}}])
+def test_array_without_items_falls_back_to_list_of_str(array_schema):
+    model = SchemaCompiler().compile("tags", {
+        "type": "object",
+        "properties": {"tags": array_schema},
+        "required": ["tags"],
+    })
+
+    assert model(tags=["a", "b"]).tags == ["a", "b"]
+    tool = StructuredTool.from_function(coroutine=lambda **kw: None, name="tags", description="d", args_schema=model)
+    params = convert_to_openai_tool(tool)["function"]["parameters"]
+    assert params["properties"]["tags"]["items"] == {"type": "string"}
+
+
+def test_same_schema_is_compiled_once():
+    compiler = SchemaCompiler()
+    schema = {"type": "object", "properties": {"q": {"type": "string"}}}
+
+    assert compiler.compile("search", schema) is compiler.compile("search", schema)
+    assert compiler.stats == {"compiled": 1, "cached": 1}
@@ -0,0 +1,108 @@
+import socketserver
+import threading
+import pytest
+from mcptools import send_email_tool
+from mcptools.send_email_tool import EmailTool
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP server tối giản: ghi lại số kết nối, lượt AUTH và email nhận được."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubSMTPHandler)
+        self.connections = 0
+        self.logins = 0
+        self.messages: list[str] = []
+        self.lock = threading.Lock()
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 stub")
+        in_data, lines = False, []
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    in_data = False
+                    with server.lock:
+                        server.messages.append("\n".join(lines))
+                    lines = []
+                    self.reply("250 queued")
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command == "EHLO":
+                self.reply("250-stub")
+                self.reply("250 AUTH PLAIN")
+            elif command == "AUTH":
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 authenticated")
+            elif command == "RCPT" and "bad@" in line:
+                self.reply("550 no such user")
+            elif command == "DATA":
+                in_data = True
+                self.reply("354 go ahead")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = StubSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(send_email_tool, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(send_email_tool, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(send_email_tool, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(send_email_tool, "EMAIL_USER", "bot@example.com")
+    monkeypatch.setattr(send_email_tool, "EMAIL_PASS", "secret")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_pooled_connection_is_reused_and_logged_in_once(smtp_server):
+    tool = EmailTool()
+    try:
+        for i in range(3):
+            assert tool.send_text_email(["a@example.com"], f"subject {i}", "body") == {"status": "success"}
+    finally:
+        tool.close()
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.connections == 1
+    assert smtp_server.logins == 1
+
+
+def test_bulk_send_reports_each_message(smtp_server):
+    tool = EmailTool()
+    messages = [
+        {"to_addresses": [f"user{i}@example.com"], "subject": f"Hi {i}", "body": "hello"} for i in range(5)
+    ]
+    messages.append({"to_addresses": ["bad@example.com"], "subject": "Hi", "body": "hello"})
+    messages.append({"to_addresses": ["ok@example.com", "bad@example.com"], "subject": "Hi", "body": "hello"})
+    try:
+        results = tool.send_bulk_email(messages)
+    finally:
+        tool.close()
+
+    assert [r["status"] for r in results] == ["success"] * 5 + ["error", "partial"]
+    assert results[6]["refused"] == "bad@example.com"
+    assert len(smtp_server.messages) == 6
+    assert smtp_server.connections <= tool.pool.max_size
+    assert smtp_server.logins == smtp_server.connections
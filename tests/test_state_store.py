@@ -0,0 +1,42 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from stateStore import JournaledStateStore
+
+
+def initial_state():
+    return {"messages": [], "summary": "", "session_id": "default"}
+
+
+def test_torn_journal_tail_is_truncated_before_append(tmp_path):
+    path = tmp_path / "state.json"
+    store = JournaledStateStore(path)
+    state = store.load(initial_state())
+    messages = [HumanMessage(content="m1"), AIMessage(content="m2")]
+    store.save({**state, "messages": messages})
+
+    # Crash giữa lúc ghi record tiếp theo
+    with open(store.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"append","messages":[{"type":"hum')
+
+    store = JournaledStateStore(path)
+    state = store.load(initial_state())
+    assert [m.content for m in state["messages"]] == ["m1", "m2"]
+
+    messages = [*state["messages"], HumanMessage(content="m3"), AIMessage(content="m4")]
+    store.save({**state, "messages": messages})
+
+    state = JournaledStateStore(path).load(initial_state())
+    assert [m.content for m in state["messages"]] == ["m1", "m2", "m3", "m4"]
+
+
+def test_unterminated_but_valid_last_record_is_dropped(tmp_path):
+    path = tmp_path / "state.json"
+    store = JournaledStateStore(path)
+    state = store.load(initial_state())
+    store.save({**state, "summary": "s1"})
+    store.journal_path.write_text(store.journal_path.read_text().rstrip("\n"))
+
+    store = JournaledStateStore(path)
+    state = store.load(initial_state())
+    store.save({**state, "summary": "s2"})
+
+    assert JournaledStateStore(path).load(initial_state())["summary"] == "s2"
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from tools.toolCache import ToolResultCache
+from tools.toolsManager import ToolManager
+
+LIST_META = {
+    "name": "list_upcoming_events",
+    "description": "List events",
+    "input_schema": {"type": "object", "properties": {"max_results": {"type": "integer"}}},
+}
+CREATE_META = {
+    "name": "create_google_calendar_event",
+    "description": "Create an event",
+    "input_schema": {"type": "object", "properties": {"summary": {"type": "string"}}, "required": ["summary"]},
+}
+
+
+class FakeClient:
+    """MCP client giả: list_upcoming_events trả về các event đã tạo, chậm một chút."""
+
+    def __init__(self):
+        self.events: list[str] = []
+        self.calls: list[str] = []
+        self.list_gate: asyncio.Event | None = None
+
+    async def call_tool(self, name, args):
+        self.calls.append(name)
+        if name == "list_upcoming_events":
+            if self.list_gate:
+                await self.list_gate.wait()
+            await asyncio.sleep(0.01)
+            payload = list(self.events)
+        else:
+            self.events.append(args["summary"])
+            payload = {"status": "success"}
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps(payload))], isError=False)
+
+
+async def load_tools(client, cache) -> dict:
+    manager = ToolManager(client, cache=cache)
+    await manager.load_from_mcp([LIST_META, CREATE_META])
+    return {tool.name: tool for tool in manager.list_tools()}
+
+
+def test_concurrent_identical_reads_share_one_call():
+    client, cache = FakeClient(), ToolResultCache()
+
+    async def scenario():
+        tools = await load_tools(client, cache)
+        results = await asyncio.gather(*(tools["list_upcoming_events"].ainvoke({"max_results": 5}) for _ in range(5)))
+        results.append(await tools["list_upcoming_events"].ainvoke({"max_results": 5}))
+        return results
+
+    results = asyncio.run(scenario())
+    assert results == [[]] * 6
+    assert client.calls == ["list_upcoming_events"]
+    stats = cache.stats()["tools"]["list_upcoming_events"]
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+
+def test_creating_an_event_invalidates_listed_events():
+    client, cache = FakeClient(), ToolResultCache()
+
+    async def scenario():
+        tools = await load_tools(client, cache)
+        before = await tools["list_upcoming_events"].ainvoke({"max_results": 5})
+        await tools["create_google_calendar_event"].ainvoke({"summary": "dentist"})
+        after = await tools["list_upcoming_events"].ainvoke({"max_results": 5})
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert (before, after) == ([], ["dentist"])
+    assert client.calls == ["list_upcoming_events", "create_google_calendar_event", "list_upcoming_events"]
+    assert cache.stats()["tools"]["list_upcoming_events"]["invalidations"] == 1
+
+
+def test_read_in_flight_during_a_write_is_not_cached():
+    client, cache = FakeClient(), ToolResultCache()
+    client.list_gate = asyncio.Event()
+
+    async def scenario():
+        tools = await load_tools(client, cache)
+        stale_read = asyncio.create_task(tools["list_upcoming_events"].ainvoke({}))
+        await asyncio.sleep(0)
+        await tools["create_google_calendar_event"].ainvoke({"summary": "dentist"})
+        client.list_gate.set()
+        await stale_read
+        return await tools["list_upcoming_events"].ainvoke({})
+
+    assert asyncio.run(scenario()) == ["dentist"]
+    assert client.calls.count("list_upcoming_events") == 2
+
+
+def test_cache_survives_a_toolset_rebuild():
+    client, cache = FakeClient(), ToolResultCache()
+
+    async def scenario():
+        first = await load_tools(client, cache)
+        await first["list_upcoming_events"].ainvoke({"max_results": 5})
+        rebuilt = await load_tools(client, cache)
+        await rebuilt["list_upcoming_events"].ainvoke({"max_results": 5})
+
+    asyncio.run(scenario())
+    assert client.calls == ["list_upcoming_events"]
+    assert cache.stats()["calls_saved"] == 1
@@ -0,0 +1,34 @@
+import asyncio
+from langchain_core.tools import StructuredTool
+from tools.toolExecutor import ToolExecutor
+
+
+def make_tool(name: str, delay: float, active: list, peak: list) -> StructuredTool:
+    async def run() -> str:
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(delay)
+        active[0] -= 1
+        return "ok"
+    return StructuredTool.from_function(coroutine=run, name=name, description=name)
+
+
+def call(name: str, i: int) -> dict:
+    return {"name": name, "args": {}, "id": f"{name}-{i}", "type": "tool_call"}
+
+
+def test_namespaced_tool_uses_base_name_limit_and_timeout():
+    active, peak = [0], [0]
+    executor = ToolExecutor(
+        [make_tool("mail__send_email", 0.05, active, peak), make_tool("docs__search", 0.2, [0], [0])],
+        limits={"send_email": 1}, timeouts={"search": 0.05}, default_timeout=5,
+    )
+
+    async def scenario():
+        sends = [executor.run(call("mail__send_email", i)) for i in range(3)]
+        return await asyncio.gather(*sends, executor.run(call("docs__search", 0)))
+
+    *sent, searched = asyncio.run(scenario())
+    assert peak[0] == 1
+    assert all(m.status == "success" for m in sent)
+    assert searched.status == "error" and "timed out" in searched.content
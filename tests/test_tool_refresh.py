@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+from langchain_core.tools import StructuredTool
+from mcpserver.mcp_registry import MCPRegistry
+from tools.toolRouter import ToolRouter
+
+
+class FakeServerClient:
+    def __init__(self, tools):
+        self.tools = tools
+        self.calls = []
+
+    async def call_tool(self, name, args):
+        self.calls.append((name, args))
+        return SimpleNamespace(content=[], isError=False)
+
+
+def make_tool(name: str) -> StructuredTool:
+    async def run(q: str = "") -> str:
+        return q
+    return StructuredTool.from_function(coroutine=run, name=name, description=f"{name} tool")
+
+
+def test_call_tool_waits_until_routes_are_fetched():
+    async def scenario():
+        registry = MCPRegistry(servers=[{"name": "docs", "path": "server.py"}])
+        server = FakeServerClient([{"name": "search", "description": "", "input_schema": {}}])
+
+        call = asyncio.create_task(registry.call_tool("search", {"q": "x"}))
+        await asyncio.sleep(0)
+        assert not call.done()
+
+        registry.clients["docs"] = server
+        await registry.fetch_tools()
+        await asyncio.wait_for(call, 1)
+        return server.calls
+
+    assert asyncio.run(scenario()) == [("search", {"q": "x"})]
+
+
+def test_router_set_tools_drops_cached_selection():
+    async def embed(texts):
+        return [[1.0, float(len(t))] for t in texts]
+
+    class Model:
+        def bind_tools(self, tools):
+            return [t.name for t in tools]
+
+    async def scenario():
+        router = ToolRouter(Model(), [make_tool(n) for n in "abc"], embed, top_k=1, pinned=())
+        assert len(await router.select([])) == 1
+        router.bind(("a",))
+
+        router.set_tools([make_tool(n) for n in "xyz"])
+        names = await router.select([])
+        return names, router.bind(names)
+
+    names, bound = asyncio.run(scenario())
+    assert set(names) <= {"x", "y", "z"}
+    assert bound == list(names)
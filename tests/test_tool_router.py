@@ -0,0 +1,33 @@
+from langchain_core.tools import StructuredTool
+from tools.toolRouter import ToolRouter
+
+
+def make_tool(name: str) -> StructuredTool:
+    async def run(q: str = "") -> str:
+        return q
+    return StructuredTool.from_function(coroutine=run, name=name, description=f"{name} tool")
+
+
+async def embed(texts):
+    return [[1.0, 0.0] for _ in texts]
+
+
+class Model:
+    def bind_tools(self, tools):
+        return [t.name for t in tools]
+
+
+def test_prompt_line_is_only_counted_for_mcp_tools():
+    tools = [make_tool("search"), make_tool("query_user_fact")]
+    router = ToolRouter(Model(), tools, embed, pinned=(), prompt_tools=["search"])
+
+    # search có dòng "Use tool" trong system prompt, tool local thì chỉ có schema
+    assert router._tool_tokens["search"] == ToolRouter._estimate_tool_tokens(tools[0], True)
+    assert router._tool_tokens["query_user_fact"] == ToolRouter._estimate_tool_tokens(tools[1], False)
+    assert router._tool_tokens["query_user_fact"] < ToolRouter._estimate_tool_tokens(tools[1], True)
+
+    router.bind(())
+    assert router.stats()["prompt_tokens_saved"] == sum(router._tool_tokens.values())
+
+    router.set_tools(tools, ["search", "query_user_fact"])
+    assert router._tool_tokens["query_user_fact"] == ToolRouter._estimate_tool_tokens(tools[1], True)
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Sequence
+import numpy as np
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 2048))
+
+
+class EmbeddingCache:
+    """
+    Cache embedding theo nội dung: LRU trong RAM, phía sau là SQLite trên đĩa.
+
+    Key = model name + sha256(text), nên đổi model sẽ không dùng nhầm vector cũ.
+    Vector được lưu dạng float32 bytes.
+    """
+
+    def __init__(self, path: str | Path, model_name: str, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.path = Path(path)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def get_many(self, texts: Sequence[str]) -> list[list[float] | None]:
+        """Trả về vector đã cache cho từng text, None nếu chưa có."""
+        keys = [self.key(t) for t in texts]
+        results: list[list[float] | None] = [None] * len(texts)
+        missing: dict[str, list[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing:
+                for key, vector in self._load(list(missing)).items():
+                    self._remember(key, vector)
+                    for i in missing.pop(key):
+                        results[i] = vector
+                        self.hits += 1
+                        self.disk_hits += 1
+                self.misses += sum(len(idx) for idx in missing.values())
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[list[float]]):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                self._remember(key, vector)
+                rows.append((key, np.asarray(vector, dtype=np.float32).tobytes()))
+            db = self._connect()
+            db.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, keys: list[str]) -> dict[str, list[float]]:
+        db = self._connect()
+        found = {}
+        # SQLite giới hạn số tham số trong một câu lệnh
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update({key: np.frombuffer(blob, dtype=np.float32).tolist() for key, blob in rows})
+        return found
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+        return self._db
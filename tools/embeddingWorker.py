@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Sequence
+
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", 64))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", 5))
+
+
+class EmbeddingWorker:
+    """
+    Thread riêng chạy encoder, gộp các request đồng thời thành một lần encode.
+
+    Mỗi request là một list text và nhận về một Future chứa list vector
+    tương ứng. Worker lấy request đầu tiên, chờ thêm tối đa
+    EMBEDDING_MAX_WAIT_MS để gom request khác (tới EMBEDDING_MAX_BATCH text),
+    rồi chạy một forward pass cho cả batch.
+    """
+
+    def __init__(self, encode_fn: Callable[[list[str]], Sequence], max_batch: int = EMBEDDING_MAX_BATCH, max_wait_ms: float = EMBEDDING_MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        future: Future = Future()
+        texts = list(texts)
+        if not texts:
+            future.set_result([])
+            return future
+        self._ensure_started()
+        self._queue.put((texts, future))
+        return future
+
+    async def encode(self, texts: Sequence[str]) -> list[list[float]]:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def encode_sync(self, texts: Sequence[str]) -> list[list[float]]:
+        return self.submit(texts).result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._process(batch)
+
+    def _process(self, batch: list[tuple[list[str], Future]]):
+        # Bỏ các request đã bị huỷ, các future còn lại không thể huỷ nữa
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for item, _ in batch for text in item]
+        try:
+            vectors = self.encode_fn(texts)
+            vectors = [v.tolist() if hasattr(v, "tolist") else list(v) for v in vectors]
+        except Exception as e:
+            logging.error(f"Embedding batch failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.requests += len(batch)
+        offset = 0
+        for item, future in batch:
+            future.set_result(vectors[offset:offset + len(item)])
+            offset += len(item)
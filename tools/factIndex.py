@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Sequence
+import numpy as np
+
+# Các field metadata được đánh bitset để lọc nhanh
+INDEXED_FIELDS = ("category", "name", "type")
+
+
+def content_fingerprint(ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[dict]) -> str:
+    """Hash của id + document + metadata, không phụ thuộc thứ tự; đổi khi bất kỳ fact nào bị sửa."""
+    digest = hashlib.sha256()
+    for row in sorted(
+        json.dumps([doc_id, document, metadata or {}], sort_keys=True, ensure_ascii=False)
+        for doc_id, document, metadata in zip(ids, documents, metadatas)
+    ):
+        digest.update(row.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def collection_fingerprint(collection) -> str:
+    """Fingerprint của collection Chroma (không đọc embedding)."""
+    data = collection.get(include=["documents", "metadatas"])
+    return content_fingerprint(data["ids"], data["documents"], data["metadatas"])
+
+
+class FactIndex:
+    """
+    Index vector trong process cho kho fact nhỏ (vài trăm tới vài nghìn fact).
+
+    - Ma trận embedding đã chuẩn hoá (float32, hoặc int8 + scale theo hàng),
+      lưu bằng .npy và mở lại bằng memory map.
+    - Cosine score = một phép nhân ma trận-vector bằng NumPy.
+    - Mỗi cặp (field, value) của INDEXED_FIELDS có một bitset, filter là AND các bitset.
+
+    Chroma vẫn là nguồn dữ liệu chính; index này chỉ là bản sao để đọc nhanh
+    và có thể dựng lại bất cứ lúc nào bằng `rebuild`.
+    """
+
+    def __init__(self, path: str | Path, quantize: bool = False):
+        self.path = Path(path)
+        self.quantize = quantize
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self, dim: int = 0):
+        self.ids: list[str] = []
+        self.documents: list[str] = []
+        self.metadatas: list[dict] = []
+        self._positions: dict[str, int] = {}
+        dtype = np.int8 if self.quantize else np.float32
+        self._matrix = np.zeros((0, dim), dtype=dtype)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._bitsets: dict[tuple[str, str], np.ndarray] = {}
+        # Fingerprint nội dung tại lần lưu/mở gần nhất, để so với Chroma khi khởi động
+        self.stored_fingerprint: str | None = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rebuild(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[dict], embeddings):
+        with self._lock:
+            self._reset()
+            self.upsert(ids, documents, metadatas, embeddings)
+
+    def rebuild_from_collection(self, collection):
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.rebuild(data["ids"], data["documents"], [m or {} for m in data["metadatas"]], embeddings)
+
+    def upsert(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[dict], embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if len(ids) == 0:
+            return
+        with self._lock:
+            rows, scales = self._encode_rows(vectors)
+            if self._matrix.shape[0] == 0:
+                self._matrix = np.zeros((0, rows.shape[1]), dtype=rows.dtype)
+
+            new_rows, new_scales = [], []
+            for i, doc_id in enumerate(ids):
+                meta = dict(metadatas[i] or {})
+                position = self._positions.get(doc_id)
+                if position is not None:
+                    self._ensure_writable()
+                    self._matrix[position] = rows[i]
+                    self._scales[position] = scales[i]
+                    self.documents[position] = documents[i]
+                    self._set_bits(position, self.metadatas[position], False)
+                    self.metadatas[position] = meta
+                    self._set_bits(position, meta, True)
+                    continue
+                position = len(self.ids)
+                self._positions[doc_id] = position
+                self.ids.append(doc_id)
+                self.documents.append(documents[i])
+                self.metadatas.append(meta)
+                new_rows.append(rows[i])
+                new_scales.append(scales[i])
+                self._grow_bitsets(position + 1)
+                self._set_bits(position, meta, True)
+
+            if new_rows:
+                self._matrix = np.vstack([self._matrix, np.stack(new_rows)])
+                self._scales = np.concatenate([self._scales, np.asarray(new_scales, dtype=np.float32)])
+
+    def update_metadata(self, metadatas: dict[str, dict]):
+        """Thay metadata của các id đã có (vector giữ nguyên)."""
+        with self._lock:
+            for doc_id, meta in metadatas.items():
+                position = self._positions.get(doc_id)
+                if position is None:
+                    continue
+                self._set_bits(position, self.metadatas[position], False)
+                self.metadatas[position] = dict(meta)
+                self._set_bits(position, self.metadatas[position], True)
+
+    def remove(self, ids: Sequence[str]):
+        with self._lock:
+            drop = {self._positions[i] for i in ids if i in self._positions}
+            if not drop:
+                return
+            keep = np.array([p for p in range(len(self.ids)) if p not in drop], dtype=np.int64)
+            self._matrix = np.asarray(self._matrix)[keep]
+            self._scales = np.asarray(self._scales)[keep]
+            self.ids = [self.ids[p] for p in keep]
+            self.documents = [self.documents[p] for p in keep]
+            self.metadatas = [self.metadatas[p] for p in keep]
+            self._positions = {doc_id: p for p, doc_id in enumerate(self.ids)}
+            self._bitsets = {key: bits[keep] for key, bits in self._bitsets.items()}
+            self._bitsets = {key: bits for key, bits in self._bitsets.items() if bits.any()}
+
+    def query(self, query_embeddings, k: int = 3, filters: dict | None = None) -> list[list[str]]:
+        """Top-k document cho từng query embedding, lọc theo filters (so khớp bằng nhau)."""
+        return [[row["document"] for row in rows] for rows in self.search(query_embeddings, k, filters)]
+
+    def search(self, query_embeddings, k: int = 3, filters: dict | None = None) -> list[list[dict]]:
+        """Như `query` nhưng trả về id, document, metadata và cosine score của từng kết quả."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        with self._lock:
+            n = len(self.ids)
+            if n == 0:
+                return [[] for _ in range(len(queries))]
+
+            mask = None
+            for field, value in (filters or {}).items():
+                bits = self._bitsets.get((field, str(value)))
+                if bits is None:
+                    return [[] for _ in range(len(queries))]
+                mask = bits if mask is None else mask & bits
+
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            scores = (self._matrix @ queries.T).astype(np.float32)
+            if self.quantize:
+                scores *= self._scales[:, None]
+            if mask is not None:
+                scores[~mask] = -np.inf
+                k = min(k, int(mask.sum()))
+            k = min(k, n)
+            if k <= 0:
+                return [[] for _ in range(len(queries))]
+
+            results = []
+            for column in scores.T:
+                top = np.argpartition(-column, k - 1)[:k]
+                top = top[np.argsort(-column[top])]
+                results.append([
+                    {
+                        "id": self.ids[p],
+                        "document": self.documents[p],
+                        "metadata": self.metadatas[p],
+                        "score": float(column[p]),
+                    }
+                    for p in top
+                ])
+            return results
+
+    def save(self):
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            np.save(self.path / "vectors.tmp.npy", np.asarray(self._matrix))
+            np.save(self.path / "scales.tmp.npy", np.asarray(self._scales))
+            os.replace(self.path / "vectors.tmp.npy", self.path / "vectors.npy")
+            os.replace(self.path / "scales.tmp.npy", self.path / "scales.npy")
+            self.save_metadata()
+
+    def save_metadata(self):
+        """
+        Chỉ ghi meta.json, dùng sau `update_metadata` (vector và thứ tự id không đổi).
+        Không thay vectors.npy đang được memory-map.
+        """
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            meta = {
+                "quantize": self.quantize,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+                "fingerprint": content_fingerprint(self.ids, self.documents, self.metadatas),
+            }
+            self.stored_fingerprint = meta["fingerprint"]
+            with open(self.path / "meta.tmp.json", "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(self.path / "meta.tmp.json", self.path / "meta.json")
+
+    def load(self) -> bool:
+        """Mở index đã lưu (memory-mapped). Trả về False nếu chưa có hoặc không khớp cấu hình."""
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            return False
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("quantize") != self.quantize:
+            return False
+        with self._lock:
+            self._reset()
+            self._matrix = np.load(self.path / "vectors.npy", mmap_mode="r")
+            self._scales = np.load(self.path / "scales.npy")
+            self.ids = meta["ids"]
+            self.documents = meta["documents"]
+            self.metadatas = meta["metadatas"]
+            self.stored_fingerprint = meta.get("fingerprint")
+            self._positions = {doc_id: p for p, doc_id in enumerate(self.ids)}
+            self._grow_bitsets(len(self.ids))
+            for position, metadata in enumerate(self.metadatas):
+                self._set_bits(position, metadata, True)
+        return True
+
+    def _encode_rows(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if not self.quantize:
+            return vectors.astype(np.float32), np.ones(len(vectors), dtype=np.float32)
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        rows = np.round(vectors / scales[:, None]).astype(np.int8)
+        return rows, scales.astype(np.float32)
+
+    def _ensure_writable(self):
+        # Ma trận mmap chỉ đọc: chép vào RAM trước khi sửa tại chỗ
+        if isinstance(self._matrix, np.memmap) or not self._matrix.flags.writeable:
+            self._matrix = np.array(self._matrix)
+
+    def _grow_bitsets(self, size: int):
+        for key, bits in self._bitsets.items():
+            if len(bits) < size:
+                self._bitsets[key] = np.concatenate([bits, np.zeros(size - len(bits), dtype=bool)])
+
+    def _set_bits(self, position: int, metadata: dict, value: bool):
+        for field in INDEXED_FIELDS:
+            if field not in metadata:
+                continue
+            key = (field, str(metadata[field]))
+            bits = self._bitsets.get(key)
+            if bits is None:
+                if not value:
+                    continue
+                bits = np.zeros(len(self.ids), dtype=bool)
+                self._bitsets[key] = bits
+            bits[position] = value
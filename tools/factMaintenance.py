@@ -0,0 +1,241 @@
+"""
+Vòng đời của kho fact: dedupe, hết hạn fact hội thoại, giới hạn kích thước.
+
+Các hàm ở đây là policy thuần (không đụng tới Chroma) để tools.updateUserFact
+dùng khi ghi/đọc. Chạy module như script để compact toàn bộ collection:
+
+    python -m tools.factMaintenance compact
+    python -m tools.factMaintenance stats
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+# Cosine similarity từ ngưỡng này trở lên được coi là cùng một fact
+FACT_DEDUPE_THRESHOLD = float(os.getenv("FACT_DEDUPE_THRESHOLD", 0.92))
+# Thời gian sống của fact category "conversation" (giây)
+CONVERSATION_FACT_TTL = int(os.getenv("CONVERSATION_FACT_TTL", 7 * 24 * 3600))
+# Số fact tối đa trong collection, vượt quá thì evict
+FACT_STORE_MAX = int(os.getenv("FACT_STORE_MAX", 5000))
+# last_access chỉ được ghi lại nếu cũ hơn khoảng này, tránh một lần ghi cho mỗi query
+FACT_ACCESS_RESOLUTION = int(os.getenv("FACT_ACCESS_RESOLUTION", 3600))
+# Khoảng thời gian tối thiểu giữa hai lần dọn fact hết hạn khi ghi
+FACT_PURGE_INTERVAL = int(os.getenv("FACT_PURGE_INTERVAL", 600))
+
+# Category có priority thấp bị evict trước
+CATEGORY_PRIORITY = {
+    "conversation": 0,
+    "general": 1,
+    "goal": 2,
+    "preference": 3,
+    "profile": 4,
+}
+
+
+def stamp_metadata(metadata: dict, now: float | None = None) -> dict:
+    """Thêm created_at / last_access / expires_at (0 = không hết hạn)."""
+    now = now or time.time()
+    stamped = dict(metadata)
+    stamped.setdefault("created_at", now)
+    stamped["last_access"] = now
+    if stamped.get("category") == "conversation":
+        stamped["expires_at"] = now + CONVERSATION_FACT_TTL
+    else:
+        stamped.setdefault("expires_at", 0)
+    return stamped
+
+
+def backfill_metadata(metadata: dict, now: float | None = None) -> dict:
+    """Bổ sung các field vòng đời cho fact cũ mà không đổi giá trị đã có."""
+    now = now or time.time()
+    filled = dict(metadata)
+    filled.setdefault("created_at", now)
+    filled.setdefault("last_access", filled["created_at"])
+    if "expires_at" not in filled:
+        ttl = CONVERSATION_FACT_TTL if filled.get("category") == "conversation" else None
+        filled["expires_at"] = filled["created_at"] + ttl if ttl else 0
+    return filled
+
+
+def is_expired(metadata: dict | None, now: float | None = None) -> bool:
+    expires_at = (metadata or {}).get("expires_at") or 0
+    return expires_at > 0 and expires_at <= (now or time.time())
+
+
+def needs_touch(metadata: dict | None, now: float | None = None) -> bool:
+    last_access = (metadata or {}).get("last_access") or 0
+    return (now or time.time()) - last_access >= FACT_ACCESS_RESOLUTION
+
+
+def similarity_from_distance(distance: float, space: str = "l2") -> float:
+    """Đổi distance của Chroma sang cosine similarity (embedding đã chuẩn hoá)."""
+    if space == "l2":
+        return 1 - distance / 2
+    return 1 - distance
+
+
+def eviction_order(ids: list[str], metadatas: list[dict]) -> list[str]:
+    """Sắp xếp id theo thứ tự nên evict: priority thấp, lâu không dùng trước."""
+    def key(item):
+        _, meta = item
+        meta = meta or {}
+        return (
+            CATEGORY_PRIORITY.get(meta.get("category"), 1),
+            meta.get("last_access") or meta.get("created_at") or 0,
+        )
+    return [doc_id for doc_id, _ in sorted(zip(ids, metadatas), key=key)]
+
+
+def select_evictions(ids: list[str], metadatas: list[dict], max_size: int = FACT_STORE_MAX) -> list[str]:
+    overflow = len(ids) - max_size
+    if overflow <= 0:
+        return []
+    return eviction_order(ids, metadatas)[:overflow]
+
+
+def dedupe_group(metadata: dict | None) -> tuple:
+    """Chỉ fact cùng category, name và type mới có thể là bản trùng của nhau."""
+    metadata = metadata or {}
+    return metadata.get("category"), metadata.get("name"), metadata.get("type")
+
+
+def find_duplicates(ids: list[str], metadatas: list[dict], embeddings, threshold: float = FACT_DEDUPE_THRESHOLD) -> list[str]:
+    """
+    Trả về các id là bản trùng gần (cùng category, name, type) của một fact mới hơn.
+    Trong mỗi cụm chỉ giữ fact được tạo gần nhất.
+    """
+    if len(ids) < 2:
+        return []
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    newest_first = sorted(
+        range(len(ids)),
+        key=lambda i: (metadatas[i] or {}).get("created_at") or 0,
+        reverse=True,
+    )
+    kept: dict[tuple, list[int]] = {}
+    duplicates = []
+    for i in newest_first:
+        group = kept.setdefault(dedupe_group(metadatas[i]), [])
+        if group and float((vectors[group] @ vectors[i]).max()) >= threshold:
+            duplicates.append(ids[i])
+        else:
+            group.append(i)
+    return duplicates
+
+
+def staging_name(collection_name: str) -> str:
+    return f"{collection_name}_compact"
+
+
+def recover_collection(client, collection_name: str = "user_facts") -> bool:
+    """
+    Hoàn tất lần compact bị ngắt giữa lúc xoá collection chính và đổi tên staging.
+
+    Staging chỉ được coi là bản hoàn chỉnh khi collection chính đã mất hoặc
+    rỗng (collection chính chỉ bị xoá sau khi staging ghi xong). Ngược lại
+    staging là bản dở dang và bị bỏ. Trả về True nếu đã khôi phục từ staging.
+    """
+    names = {getattr(c, "name", c) for c in client.list_collections()}
+    staging = staging_name(collection_name)
+    if staging not in names:
+        return False
+    staged = client.get_collection(staging)
+    main_count = client.get_collection(collection_name).count() if collection_name in names else 0
+    if main_count == 0 and staged.count() > 0:
+        if collection_name in names:
+            client.delete_collection(collection_name)
+        staged.modify(name=collection_name)
+        return True
+    client.delete_collection(staging)
+    return False
+
+
+def compact_collection(client, collection_name: str = "user_facts") -> dict:
+    """
+    Dựng lại collection: bỏ fact hết hạn, gộp bản trùng, áp giới hạn kích thước.
+    Collection được tạo lại từ đầu nên index HNSW cũng gọn lại.
+    """
+    recover_collection(client, collection_name)
+    collection = client.get_or_create_collection(collection_name)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    ids = list(data["ids"])
+    documents = list(data["documents"])
+    metadatas = [m or {} for m in data["metadatas"]]
+    embeddings = data["embeddings"]
+    embeddings = [] if embeddings is None else list(embeddings)
+    before = len(ids)
+
+    now = time.time()
+    alive = [i for i in range(len(ids)) if not is_expired(metadatas[i], now)]
+    expired = before - len(alive)
+    ids, documents, metadatas, embeddings = (
+        [ids[i] for i in alive], [documents[i] for i in alive],
+        [metadatas[i] for i in alive], [embeddings[i] for i in alive],
+    )
+
+    drop = set(find_duplicates(ids, metadatas, embeddings))
+    duplicates = len(drop)
+    drop |= set(select_evictions(
+        [i for i in ids if i not in drop],
+        [m for i, m in zip(ids, metadatas) if i not in drop],
+    ))
+    keep = [i for i, doc_id in enumerate(ids) if doc_id not in drop]
+
+    # Ghi vào collection tạm rồi mới thay thế, dữ liệu không mất nếu bị ngắt giữa chừng
+    staging = client.create_collection(staging_name(collection_name), metadata=collection.metadata)
+    for start in range(0, len(keep), 1000):
+        chunk = keep[start:start + 1000]
+        staging.add(
+            ids=[ids[i] for i in chunk],
+            documents=[documents[i] for i in chunk],
+            metadatas=[backfill_metadata(metadatas[i], now) for i in chunk],
+            embeddings=[list(embeddings[i]) for i in chunk],
+        )
+    client.delete_collection(collection_name)
+    staging.modify(name=collection_name)
+
+    return {
+        "before": before,
+        "expired": expired,
+        "duplicates": duplicates,
+        "evicted": len(drop) - duplicates,
+        "after": len(keep),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the user fact store.")
+    parser.add_argument("command", choices=["compact", "stats"])
+    args = parser.parse_args()
+
+    import chromadb
+    from tools.updateUserFact import VECTOR_DB_PATH, FACT_INDEX_PATH, FACT_INDEX_QUANTIZE
+    from tools.factIndex import FactIndex
+
+    client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+    if args.command == "compact":
+        report = compact_collection(client)
+        index = FactIndex(FACT_INDEX_PATH, quantize=FACT_INDEX_QUANTIZE)
+        index.rebuild_from_collection(client.get_or_create_collection("user_facts"))
+        index.save()
+        print(report)
+        return
+
+    data = client.get_or_create_collection("user_facts").get(include=["metadatas"])
+    now = time.time()
+    categories: dict[str, int] = {}
+    for meta in data["metadatas"]:
+        category = (meta or {}).get("category", "unknown")
+        categories[category] = categories.get(category, 0) + 1
+    print({
+        "total": len(data["ids"]),
+        "expired": sum(is_expired(m, now) for m in data["metadatas"]),
+        "by_category": categories,
+        "max": FACT_STORE_MAX,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Literal, Optional, Union
+from pydantic import BaseModel, Field, create_model
+from pydantic_core import to_jsonable_python
+
+TOOL_METADATA_CACHE_PATH = os.getenv("TOOL_METADATA_CACHE_PATH", "data/tool_metadata.json")
+
+PRIMITIVE_TYPES = {
+    "string": str,
+    "number": float,
+    "integer": int,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def schema_hash(schema: dict) -> str:
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def to_jsonable(args: dict) -> dict:
+    """Argument đã validate (có thể chứa model lồng nhau) -> dict JSON để gửi cho MCP."""
+    return to_jsonable_python(args)
+
+
+class SchemaCompiler:
+    """
+    Biên dịch JSON Schema của MCP tool thành pydantic model cho StructuredTool.
+
+    Hỗ trợ object lồng nhau, array of object, enum, default, optional
+    (anyOf với null / type list) và $ref tới $defs. Model được cache theo
+    hash của schema, nên tool có schema giống nhau (hoặc load lại) không phải
+    create_model lần nữa.
+    """
+
+    def __init__(self):
+        self._models: dict[str, type[BaseModel]] = {}
+        self.stats = {"compiled": 0, "cached": 0}
+
+    def compile(self, name: str, schema: dict) -> type[BaseModel]:
+        key = schema_hash({"name": name, "schema": schema})
+        model = self._models.get(key)
+        if model is not None:
+            self.stats["cached"] += 1
+            return model
+        defs = {**schema.get("definitions", {}), **schema.get("$defs", {})}
+        model = self._object_model(f"{name}Args", schema, defs, {})
+        self._models[key] = model
+        self.stats["compiled"] += 1
+        return model
+
+    def _object_model(self, model_name: str, schema: dict, defs: dict, resolved: dict) -> type[BaseModel]:
+        required = set(schema.get("required", []))
+        fields = {}
+        for field_name, prop in schema.get("properties", {}).items():
+            annotation = self._type(prop, defs, resolved, f"{model_name}_{field_name}")
+            info = {"description": prop.get("description") or prop.get("title")}
+            if field_name in required:
+                fields[field_name] = (annotation, Field(..., **info))
+            elif "default" in prop:
+                fields[field_name] = (annotation, Field(prop["default"], **info))
+            else:
+                fields[field_name] = (Optional[annotation], Field(None, **info))
+        return create_model(model_name, **fields)
+
+    def _type(self, prop: dict, defs: dict, resolved: dict, model_name: str):
+        if "$ref" in prop:
+            ref_name = prop["$ref"].rsplit("/", 1)[-1]
+            if ref_name not in resolved:
+                target = defs.get(ref_name)
+                if target is None:
+                    logging.warning(f"Unresolved schema reference {prop['$ref']}, using Any")
+                    return Any
+                resolved[ref_name] = Any  # chặn đệ quy vô hạn với schema tự tham chiếu
+                resolved[ref_name] = self._type(target, defs, resolved, ref_name)
+            return resolved[ref_name]
+
+        if "enum" in prop:
+            return Literal[tuple(prop["enum"])]
+        if "const" in prop:
+            return Literal[prop["const"]]
+
+        variants = prop.get("anyOf") or prop.get("oneOf")
+        if variants is None and len(prop.get("allOf", [])) == 1:
+            return self._type(prop["allOf"][0], defs, resolved, model_name)
+        if variants is None and isinstance(prop.get("type"), list):
+            variants = [{**prop, "type": t} for t in prop["type"]]
+        if variants is not None:
+            nullable = any(v.get("type") == "null" for v in variants)
+            types = [
+                self._type(v, defs, resolved, f"{model_name}_{i}")
+                for i, v in enumerate(variants) if v.get("type") != "null"
+            ]
+            annotation = types[0] if len(types) == 1 else Union[tuple(types)] if types else Any
+            return Optional[annotation] if nullable else annotation
+
+        schema_type = prop.get("type")
+        if schema_type == "object" or "properties" in prop:
+            if prop.get("properties"):
+                return self._object_model(prop.get("title", model_name).replace(" ", ""), prop, defs, resolved)
+            additional = prop.get("additionalProperties")
+            if isinstance(additional, dict) and additional:
+                return dict[str, self._type(additional, defs, resolved, f"{model_name}_value")]
+            return dict
+        if schema_type == "array":
+            items = prop.get("items")
+            if not items:
+                # Gemini từ chối ARRAY không có items, nên mặc định là list[str]
+                return list[str]
+            return list[self._type(items, defs, resolved, f"{model_name}_item")]
+        return PRIMITIVE_TYPES.get(schema_type, Any)
+
+
+def server_fingerprint(servers: list[dict]) -> str:
+    """
+    Hash cấu hình server + nội dung script của từng server; đổi code server thì
+    metadata đã lưu không còn hợp lệ.
+    """
+    digest = hashlib.sha256()
+    for server in servers:
+        digest.update(json.dumps(server, sort_keys=True).encode("utf-8"))
+        path = Path(server.get("path") or "")
+        if path.is_file():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class ToolMetadataCache:
+    """Lưu tools_meta của lần list_tools trước, gắn với fingerprint của server."""
+
+    def __init__(self, path: str | Path = TOOL_METADATA_CACHE_PATH):
+        self.path = Path(path)
+
+    def load(self, fingerprint: str) -> list[dict] | None:
+        if not self.path.exists():
+            return None
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable tool metadata cache {self.path}: {e}")
+            return None
+        if data.get("fingerprint") != fingerprint:
+            return None
+        return data.get("tools")
+
+    def save(self, fingerprint: str, tools: list[dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "tools": tools}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
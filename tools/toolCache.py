@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from mcpserver.mcp_registry import base_tool_name
+
+# TTL (giây) của kết quả từng tool; tool không có ở đây thì không cache
+TOOL_CACHE_TTLS = {
+    "search": 600,
+    "list_upcoming_events": 60,
+}
+
+# Gọi thành công tool bên trái sẽ xoá cache của các tool bên phải
+TOOL_CACHE_INVALIDATIONS = {
+    "create_google_calendar_event": ["list_upcoming_events"],
+    "create_google_calendar_events": ["list_upcoming_events"],
+}
+
+TOOL_CACHE_MAX_ENTRIES = 512
+
+
+def cache_key(tool_name: str, args: dict) -> str:
+    """Key từ tên tool + argument đã chuẩn hoá (sắp xếp key, bỏ khoảng trắng)."""
+    canonical = json.dumps(args, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return f"{tool_name}:{canonical}"
+
+
+class ToolResultCache:
+    """
+    Cache kết quả tool theo TTL, có single-flight và invalidation khi ghi.
+
+    - Các lời gọi giống hệt nhau đang chạy cùng lúc dùng chung một request.
+    - Gọi một tool ghi (vd. create_google_calendar_event) xoá cache của các
+      tool đọc liên quan; kết quả đang bay của tool đọc đó cũng không được lưu.
+    """
+
+    def __init__(self, ttls: dict[str, float] | None = None, invalidations: dict[str, list[str]] | None = None, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        self.ttls = TOOL_CACHE_TTLS if ttls is None else ttls
+        self.invalidations = TOOL_CACHE_INVALIDATIONS if invalidations is None else invalidations
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str, object]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._generations: dict[str, int] = {}
+        self._stats: dict[str, dict[str, int]] = {}
+
+    async def call(self, tool_name: str, args: dict, fetch: Callable[[], Awaitable], cacheable: Callable[[object], bool] = lambda result: True):
+        base = base_tool_name(tool_name)
+        ttl = self.ttls.get(base)
+        if ttl is None:
+            result = await fetch()
+            self.invalidate_for(tool_name)
+            return result
+
+        stats = self._tool_stats(base)
+        key = cache_key(tool_name, args)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            stats["hits"] += 1
+            return entry[2]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        stats["misses"] += 1
+        generation = self._generations.get(base, 0)
+        future = asyncio.ensure_future(fetch())
+        self._inflight[key] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        if cacheable(result) and self._generations.get(base, 0) == generation:
+            self._entries[key] = (time.monotonic() + ttl, base, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate_for(self, tool_name: str):
+        """Áp dụng các rule invalidation của tool vừa được gọi."""
+        for target in self.invalidations.get(base_tool_name(tool_name), []):
+            self.invalidate(target)
+
+    def invalidate(self, base_name: str):
+        self._generations[base_name] = self._generations.get(base_name, 0) + 1
+        for key in [k for k, (_, base, _) in self._entries.items() if base == base_name]:
+            del self._entries[key]
+        self._tool_stats(base_name)["invalidations"] += 1
+
+    def stats(self) -> dict:
+        tools = {}
+        hits = lookups = 0
+        for name, s in self._stats.items():
+            tool_lookups = s["hits"] + s["coalesced"] + s["misses"]
+            saved = s["hits"] + s["coalesced"]
+            tools[name] = {**s, "hit_rate": saved / tool_lookups if tool_lookups else 0.0}
+            hits += saved
+            lookups += tool_lookups
+        return {
+            "calls_saved": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "tools": tools,
+        }
+
+    def _tool_stats(self, base_name: str) -> dict[str, int]:
+        return self._stats.setdefault(
+            base_name, {"hits": 0, "coalesced": 0, "misses": 0, "invalidations": 0}
+        )
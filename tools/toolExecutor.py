@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import time
+from langchain_core.messages import AIMessage, ToolMessage
+from mcpserver.mcp_registry import base_tool_name
+
+TOOL_DEFAULT_TIMEOUT = float(os.getenv("TOOL_DEFAULT_TIMEOUT", 30))
+
+# Số lời gọi đồng thời tối đa cho từng tool (không có trong dict = không giới hạn)
+TOOL_CONCURRENCY_LIMITS = {
+    "send_email": 2,
+    "create_google_calendar_event": 2,
+    "create_google_calendar_events": 1,
+    "update_user_fact": 4,
+}
+
+# Deadline riêng cho từng tool (giây), còn lại dùng TOOL_DEFAULT_TIMEOUT
+TOOL_TIMEOUTS = {
+    "search": 20,
+    "list_upcoming_events": 15,
+    "create_google_calendar_events": 60,
+    "query_user_fact": 10,
+}
+
+
+class ToolExecutor:
+    """
+    Node thay cho ToolNode: chạy song song mọi tool call trong một AIMessage.
+
+    Mỗi tool có semaphore giới hạn số lời gọi đồng thời và deadline riêng.
+    Tool bị quá hạn hoặc lỗi trả về ToolMessage status="error" thay vì làm
+    hỏng cả lượt, nên các tool khác vẫn có kết quả và độ trễ của lượt bằng
+    tool chậm nhất chứ không phải tổng.
+    """
+
+    def __init__(self, tools, limits: dict[str, int] | None = None, timeouts: dict[str, float] | None = None, default_timeout: float = TOOL_DEFAULT_TIMEOUT):
+        self.tools = {t.name: t for t in tools}
+        self.limits = TOOL_CONCURRENCY_LIMITS if limits is None else limits
+        self.timeouts = TOOL_TIMEOUTS if timeouts is None else timeouts
+        self.default_timeout = default_timeout
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def set_tools(self, tools):
+        self.tools = {t.name: t for t in tools}
+
+    async def __call__(self, state) -> dict:
+        message = next(
+            (m for m in reversed(state["messages"]) if isinstance(m, AIMessage)), None
+        )
+        if message is None or not message.tool_calls:
+            return {"messages": []}
+        results = await asyncio.gather(*(self.run(call) for call in message.tool_calls))
+        return {"messages": list(results)}
+
+    async def run(self, call: dict) -> ToolMessage:
+        name = call["name"]
+        tool = self.tools.get(name)
+        if tool is None:
+            return self._error(call, f"Error: tool '{name}' is not available.")
+
+        # Limit và timeout khai báo theo tên gốc, tool của nhiều server có dạng <server>__<tool>
+        timeout = self.timeouts.get(base_tool_name(name), self.default_timeout)
+        semaphore = self._semaphore(name)
+        start = time.perf_counter()
+
+        async def guarded():
+            if semaphore is None:
+                return await self._invoke(tool, call)
+            async with semaphore:
+                return await self._invoke(tool, call)
+
+        try:
+            # Deadline tính cả thời gian chờ semaphore
+            result = await asyncio.wait_for(guarded(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Tool {name} timed out after {timeout}s")
+            return self._error(call, f"Error: tool '{name}' timed out after {timeout:g}s. Other results are still valid.")
+        except Exception as e:
+            logging.error(f"Tool {name} failed: {e}")
+            return self._error(call, f"Error: {e!r}")
+        logging.info(f"Tool {name} finished in {time.perf_counter() - start:.2f}s")
+        return result
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore | None:
+        """Semaphore riêng cho từng tool (theo tên đầy đủ), limit lấy theo tên gốc."""
+        limit = self.limits.get(base_tool_name(name))
+        if not limit:
+            return None
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(limit)
+        return self._semaphores[name]
+
+    @staticmethod
+    async def _invoke(tool, call: dict) -> ToolMessage:
+        # Gọi với tool call đầy đủ để nhận về ToolMessage đã gắn tool_call_id
+        output = await tool.ainvoke({**call, "type": "tool_call"})
+        if isinstance(output, ToolMessage):
+            return output
+        return ToolMessage(content=str(output), name=call["name"], tool_call_id=call["id"])
+
+    @staticmethod
+    def _error(call: dict, content: str) -> ToolMessage:
+        return ToolMessage(content=content, name=call["name"], tool_call_id=call["id"], status="error")
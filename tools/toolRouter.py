@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Collection, Sequence
+import numpy as np
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from contextBuilder import estimate_tokens, message_text
+from mcpserver.mcp_registry import base_tool_name
+
+# Số tool liên quan nhất được bind mỗi lượt (0 = bind tất cả như trước)
+TOOL_ROUTER_TOP_K = int(os.getenv("TOOL_ROUTER_TOP_K", 4))
+# Tool luôn được bind, bất kể câu hỏi (tên gốc, không namespace)
+TOOL_ROUTER_PINNED = [
+    name.strip() for name in os.getenv("TOOL_ROUTER_PINNED", "update_user_fact,query_user_fact").split(",") if name.strip()
+]
+TOOL_ROUTER_MAX_BOUND_MODELS = 32
+# Số lượt gần nhất giữ lại lựa chọn tool (nhiều session chạy xen kẽ)
+TOOL_ROUTER_MAX_TURNS = 256
+
+
+class ToolRouter:
+    """
+    Chọn tập tool cho từng lượt thay vì bind mọi tool vào mọi lời gọi model.
+
+    Mô tả tool được embed một lần; mỗi lượt user, câu hỏi được embed và top_k
+    tool gần nhất (cosine) cùng các tool pinned được bind. Model đã bind được
+    cache theo tập tool. Các lời gọi model trong cùng một lượt (vòng lặp tool)
+    dùng lại lựa chọn của lượt đó.
+    """
+
+    def __init__(self, model, tools: Sequence[BaseTool], embed: Callable[[list[str]], Awaitable[list]], top_k: int = TOOL_ROUTER_TOP_K, pinned: Sequence[str] = TOOL_ROUTER_PINNED, max_bound_models: int = TOOL_ROUTER_MAX_BOUND_MODELS, prompt_tools: Collection[str] = ()):
+        self.model = model
+        self.embed = embed
+        self.top_k = top_k
+        self.pinned = set(pinned)
+        self.max_bound_models = max_bound_models
+        self._stats = {"calls": 0, "tools_bound": 0, "tokens_saved": 0}
+        self.set_tools(tools, prompt_tools)
+
+    def set_tools(self, tools: Sequence[BaseTool], prompt_tools: Collection[str] = ()):
+        """
+        Thay toolset (vd. sau khi list_tools khác metadata đã lưu); bỏ mọi cache cũ.
+        prompt_tools là tên các tool có dòng mô tả trong system prompt (tool MCP).
+        """
+        prompt_tools = set(prompt_tools)
+        self.tools = list(tools)
+        self._matrix: np.ndarray | None = None
+        self._bound: OrderedDict[tuple[str, ...], object] = OrderedDict()
+        self._turns: OrderedDict[str | None, tuple[str, ...]] = OrderedDict()
+        self._tool_tokens = {
+            tool.name: self._estimate_tool_tokens(tool, tool.name in prompt_tools) for tool in self.tools
+        }
+
+    async def select(self, messages: Sequence[BaseMessage]) -> tuple[str, ...]:
+        """Tên các tool cho lượt hiện tại, giữ thứ tự gốc để key cache ổn định."""
+        if not self.top_k or len(self.tools) <= self.top_k:
+            return tuple(tool.name for tool in self.tools)
+
+        human = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+        turn_id = getattr(human, "id", None) or (message_text(human) if human else None)
+        if turn_id in self._turns:
+            self._turns.move_to_end(turn_id)
+            return self._turns[turn_id]
+
+        try:
+            names = await self._rank(message_text(human) if human else "")
+        except Exception as e:
+            logging.warning(f"Tool routing failed, binding every tool: {e}")
+            names = tuple(tool.name for tool in self.tools)
+        self._turns[turn_id] = names
+        while len(self._turns) > TOOL_ROUTER_MAX_TURNS:
+            self._turns.popitem(last=False)
+        return names
+
+    def bind(self, names: Sequence[str]):
+        """Model đã bind đúng tập tool, lấy từ cache nếu đã bind trước đó."""
+        key = tuple(names)
+        bound = self._bound.get(key)
+        if bound is None:
+            selected = set(key)
+            bound = self.model.bind_tools([tool for tool in self.tools if tool.name in selected])
+            self._bound[key] = bound
+            while len(self._bound) > self.max_bound_models:
+                self._bound.popitem(last=False)
+        else:
+            self._bound.move_to_end(key)
+
+        self._stats["calls"] += 1
+        self._stats["tools_bound"] += len(key)
+        self._stats["tokens_saved"] += sum(
+            tokens for name, tokens in self._tool_tokens.items() if name not in key
+        )
+        return bound
+
+    def stats(self) -> dict:
+        calls = self._stats["calls"]
+        return {
+            "calls": calls,
+            "tools_total": len(self.tools),
+            "avg_tools_bound": self._stats["tools_bound"] / calls if calls else 0.0,
+            "prompt_tokens_saved": self._stats["tokens_saved"],
+            "avg_tokens_saved_per_call": self._stats["tokens_saved"] / calls if calls else 0.0,
+            "bound_models_cached": len(self._bound),
+        }
+
+    async def _rank(self, query: str) -> tuple[str, ...]:
+        # Giữ toolset của lúc bắt đầu, set_tools có thể chạy trong lúc đang embed
+        tools, matrix = self.tools, self._matrix
+        if matrix is None:
+            vectors = np.asarray(await self.embed([self._tool_text(tool) for tool in tools]), dtype=np.float32)
+            matrix = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            if tools is self.tools:
+                self._matrix = matrix
+
+        query_vector = np.asarray((await self.embed([query]))[0], dtype=np.float32)
+        scores = matrix @ (query_vector / max(float(np.linalg.norm(query_vector)), 1e-12))
+        top = set(np.argsort(-scores)[: self.top_k].tolist())
+        return tuple(
+            tool.name for i, tool in enumerate(tools)
+            if i in top or base_tool_name(tool.name) in self.pinned
+        )
+
+    @staticmethod
+    def _tool_text(tool: BaseTool) -> str:
+        return f"{tool.name.replace('_', ' ')}: {tool.description}"
+
+    @staticmethod
+    def _estimate_tool_tokens(tool: BaseTool, in_prompt: bool) -> int:
+        """Token của schema tool trong request + dòng mô tả tool trong system prompt (nếu có)."""
+        tokens = estimate_tokens(json.dumps(convert_to_openai_tool(tool), ensure_ascii=False))
+        if in_prompt:
+            tokens += estimate_tokens(f"- Use tool `{tool.name}` when: {tool.description}")
+        return tokens
@@ -1,18 +1,17 @@
 import json
-from pydantic import create_model
 from langchain_core.tools import StructuredTool
 from functools import partial
+from tools.toolCache import ToolResultCache
+from tools.schemaCompiler import SchemaCompiler, to_jsonable
+
+# Dùng chung giữa các ToolManager để model của schema đã gặp không phải biên dịch lại
+default_compiler = SchemaCompiler()
 
 class ToolManager:
-    def __init__(self, client):
+    def __init__(self, client, cache: ToolResultCache | None = None, compiler: SchemaCompiler | None = None):
         self.client = client
-        self.type_map = {
-            "string": str,
-            "number": float,
-            "integer": int,
-            "boolean": bool,
-            "array": list[str],
-        }
+        self.cache = cache or ToolResultCache()
+        self.compiler = compiler or default_compiler
         self._tools = []
 
     def register(self, tool):
@@ -24,11 +23,17 @@ class ToolManager:
         for tool in tools_meta:
             name = tool["name"]
             description = tool["description"]
-            schema = tool["input_schema"]["properties"]
+            schema = tool["input_schema"]
 
             def make_caller(tool_name: str):
                 async def _caller(**kwargs):
-                    result = await self.client.call_tool(tool_name, kwargs)
+                    kwargs = to_jsonable(kwargs)
+                    result = await self.cache.call(
+                        tool_name,
+                        kwargs,
+                        lambda: self.client.call_tool(tool_name, kwargs),
+                        cacheable=lambda r: not getattr(r, "isError", False),
+                    )
                     if not result.content:
                         return None
 
@@ -46,11 +51,7 @@ class ToolManager:
                     return normalized[0] if len(normalized) == 1 else normalized
                 return _caller
 
-            fields = {
-                k: (self.type_map.get(v.get("type"), str), ...)
-                for k, v in schema.items()
-            }
-            ArgsModel = create_model(f"{name}Args", **fields)
+            ArgsModel = self.compiler.compile(name, schema)
 
             wrapped_tool = StructuredTool.from_function(
                 coroutine=make_caller(name),
@@ -62,3 +63,7 @@ class ToolManager:
 
     def list_tools(self):
         return self._tools
+
+    def cache_stats(self):
+        """Số lời gọi MCP tiết kiệm được nhờ cache."""
+        return self.cache.stats()
@@ -1,33 +1,141 @@
-from sentence_transformers import SentenceTransformer
-from chromadb import chromadb
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from pydantic import BaseModel, Field
 from langchain_core.tools import tool
+from tools.embeddingWorker import EmbeddingWorker
+from tools.embeddingCache import EmbeddingCache
+from tools.factIndex import FactIndex, collection_fingerprint
+from tools.factMaintenance import (
+    FACT_DEDUPE_THRESHOLD,
+    FACT_PURGE_INTERVAL,
+    FACT_STORE_MAX,
+    dedupe_group,
+    find_duplicates,
+    is_expired,
+    needs_touch,
+    recover_collection,
+    select_evictions,
+    similarity_from_distance,
+    stamp_metadata,
+)
 
 VECTOR_DB_PATH = "./user_memory_db"
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-chroma_client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
-facts_collection = chroma_client.get_or_create_collection("user_facts")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_PATH = f"{VECTOR_DB_PATH}/embedding_cache.sqlite"
+FACT_INDEX_PATH = f"{VECTOR_DB_PATH}/fact_index"
+# "chroma" (mặc định) hoặc "numpy": đọc từ FactIndex trong process, Chroma vẫn là nguồn chính
+FACT_INDEX_BACKEND = os.getenv("FACT_INDEX_BACKEND", "chroma")
+FACT_INDEX_QUANTIZE = os.getenv("FACT_INDEX_QUANTIZE", "0") == "1"
+# Số fact gần nhất được xét khi tìm bản trùng của một fact mới
+DEDUPE_CANDIDATES = 5
 
+# Model và Chroma client được tạo khi dùng lần đầu (xem get_embedder / get_facts_collection)
+_embedder = None
+_facts_collection = None
+_fact_index = None
+_embedder_lock = threading.Lock()
+_collection_lock = threading.Lock()
+_index_lock = threading.Lock()
+_last_purge = 0.0
+# Tăng mỗi lần ghi / xoá fact, để cache phụ thuộc fact (vd. system prompt) biết khi nào cần build lại
+_fact_versions: dict[str, int] = {}
 
-def add_user_fact(fact: str, category: str = "general", name: str = None, fact_type: str = None):
-    """Save a fact with optional metadata (name, type, category)."""
-    embedding = embedder.encode(fact).tolist()
-    doc_id = str(hash(fact))  # unique enough for single-user setup
+
+def get_embedder():
+    """Trả về SentenceTransformer, load ở lần gọi đầu tiên."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedder
+
+
+def get_facts_collection():
+    """Trả về Chroma collection `user_facts`, mở ở lần gọi đầu tiên."""
+    global _facts_collection
+    if _facts_collection is None:
+        with _collection_lock:
+            if _facts_collection is None:
+                import chromadb
+                chroma_client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+                recover_collection(chroma_client, "user_facts")
+                _facts_collection = chroma_client.get_or_create_collection("user_facts")
+    return _facts_collection
+
+
+def get_fact_index() -> FactIndex:
+    """Trả về FactIndex, mở bản đã lưu hoặc dựng lại từ Chroma nếu lệch."""
+    global _fact_index
+    if _fact_index is None:
+        with _index_lock:
+            if _fact_index is None:
+                index = FactIndex(FACT_INDEX_PATH, quantize=FACT_INDEX_QUANTIZE)
+                collection = get_facts_collection()
+                # So fingerprint nội dung chứ không so số lượng: ghi đè khi dedupe hay
+                # cập nhật metadata giữ nguyên count nhưng vẫn làm index lệch
+                if not index.load() or index.stored_fingerprint != collection_fingerprint(collection):
+                    index.rebuild_from_collection(collection)
+                    index.save()
+                _fact_index = index
+    return _fact_index
+
+
+async def warm_up():
+    """Load embedding model và Chroma song song, ngoài event loop."""
+    await asyncio.gather(
+        asyncio.to_thread(get_embedder),
+        asyncio.to_thread(get_facts_collection),
+    )
+
+
+def _embed(texts: list[str]) -> list[list[float]]:
+    return get_embedder().encode(texts)
+
+
+# Tất cả lệnh encode đi qua một worker thread để được gộp batch
+embedding_worker = EmbeddingWorker(_embed)
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_MODEL_NAME)
+
+
+def embed_texts_sync(texts: list[str]) -> list[list[float]]:
+    """Encode qua cache, chỉ text chưa có vector mới tới transformer."""
+    vectors = embedding_cache.get_many(texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = embedding_worker.encode_sync([texts[i] for i in missing])
+        embedding_cache.put_many([texts[i] for i in missing], fresh)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+    return vectors
+
+
+async def embed_texts(texts: list[str]) -> list[list[float]]:
+    # get_many có thể đọc SQLite, không chạy trên event loop
+    vectors = await asyncio.to_thread(embedding_cache.get_many, texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = await embedding_worker.encode([texts[i] for i in missing])
+        await asyncio.to_thread(embedding_cache.put_many, [texts[i] for i in missing], fresh)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+    return vectors
+
+
+def _fact_metadata(category: str, name: str = None, fact_type: str = None) -> dict:
     metadata = {"category": category}
     if name:
         metadata["name"] = name
     if fact_type:
         metadata["type"] = fact_type
-
-    facts_collection.add(
-        ids=[doc_id],
-        metadatas=[metadata],
-        documents=[fact],
-        embeddings=[embedding]
-    )
+    return metadata
 
 
-def query_user_facts(query: str, k=3, category: str = None, name: str = None, fact_type: str = None):
-    """Query facts using both metadata filter and semantic similarity."""
+def _where_filter(category: str = None, name: str = None, fact_type: str = None) -> dict | None:
     where_filter = {}
     if category:
         where_filter["category"] = category
@@ -35,16 +143,251 @@ def query_user_facts(query: str, k=3, category: str = None, name: str = None, fa
         where_filter["name"] = name
     if fact_type:
         where_filter["type"] = fact_type
+    return where_filter if where_filter else None
+
+
+def _chroma_where(filters: dict | None) -> dict | None:
+    """Chroma yêu cầu $and khi lọc trên nhiều field."""
+    if not filters:
+        return None
+    if len(filters) == 1:
+        return dict(filters)
+    return {"$and": [{k: v} for k, v in filters.items()]}
 
-    query_embedding = embedder.encode(query).tolist()
-    results = facts_collection.query(
-        query_embeddings=[query_embedding],
+
+def fact_id(fact: str) -> str:
+    """ID ổn định giữa các process, suy ra từ nội dung fact."""
+    return hashlib.sha256(fact.strip().encode("utf-8")).hexdigest()
+
+
+def _search_rows(query_embeddings: list[list[float]], k: int, where_filter: dict | None) -> list[list[dict]]:
+    """Top-k của từng query dưới dạng {"id", "document", "metadata", "score"} (score = cosine)."""
+    if FACT_INDEX_BACKEND == "numpy":
+        return get_fact_index().search(query_embeddings, k, where_filter)
+    collection = get_facts_collection()
+    results = collection.query(
+        query_embeddings=query_embeddings,
         n_results=k,
-        where=where_filter if where_filter else None
+        where=_chroma_where(where_filter),
+        include=["documents", "metadatas", "distances"],
+    )
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    return [
+        [
+            {
+                "id": doc_id,
+                "document": doc,
+                "metadata": meta or {},
+                "score": similarity_from_distance(distance, space),
+            }
+            for doc_id, doc, meta, distance in zip(ids, docs, metas, distances)
+        ]
+        for ids, docs, metas, distances in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"]
+        )
+    ]
+
+
+def fact_version(category: str | None = None) -> int:
+    """
+    Version của các fact thuộc category (None = mọi category). Thay đổi sau
+    mỗi lần ghi fact của category đó hoặc xoá fact bất kỳ.
+    """
+    if category is None:
+        return sum(_fact_versions.values())
+    return _fact_versions.get("*", 0) + _fact_versions.get(category, 0)
+
+
+def _bump_fact_version(categories):
+    for category in set(categories):
+        _fact_versions[category] = _fact_versions.get(category, 0) + 1
+
+
+def _update_metadata(metadatas: dict[str, dict]):
+    get_facts_collection().update(ids=list(metadatas), metadatas=list(metadatas.values()))
+    if FACT_INDEX_BACKEND == "numpy":
+        index = get_fact_index()
+        index.update_metadata(metadatas)
+        index.save_metadata()
+
+
+def _delete_facts(ids: list[str]):
+    if not ids:
+        return
+    get_facts_collection().delete(ids=ids)
+    # Không biết category của fact bị xoá nên tăng version chung
+    _bump_fact_version(["*"])
+    if FACT_INDEX_BACKEND == "numpy":
+        index = get_fact_index()
+        index.remove(ids)
+        index.save()
+
+
+def _dedupe_ids(ids: list[str], metadatas: list[dict], embeddings: list[list[float]]) -> list[str]:
+    """
+    Fact gần trùng với fact đã lưu (cùng category, name, type) sẽ ghi đè lên id cũ.
+    Fact về hai người khác nhau với câu gần giống nhau không bị gộp.
+    """
+    if get_facts_collection().count() == 0:
+        return ids
+    ids = list(ids)
+    by_group: dict[tuple, list[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        by_group.setdefault(dedupe_group(metadata), []).append(i)
+
+    for group, positions in by_group.items():
+        category, name, fact_type = group
+        # where không lọc được "không có name", nên lấy vài ứng viên rồi so khớp cả nhóm
+        nearest = _search_rows(
+            [embeddings[i] for i in positions], DEDUPE_CANDIDATES, _where_filter(category, name, fact_type)
+        )
+        for i, rows in zip(positions, nearest):
+            match = next((row for row in rows if dedupe_group(row["metadata"]) == group), None)
+            if match and match["score"] >= FACT_DEDUPE_THRESHOLD and not is_expired(match["metadata"]):
+                ids[i] = match["id"]
+                metadatas[i]["created_at"] = match["metadata"].get("created_at", metadatas[i]["created_at"])
+    return ids
+
+
+def _enforce_lifecycle():
+    """Dọn fact hết hạn (tối đa một lần mỗi FACT_PURGE_INTERVAL) và evict khi vượt FACT_STORE_MAX."""
+    global _last_purge
+    collection = get_facts_collection()
+    now = time.time()
+    if now - _last_purge >= FACT_PURGE_INTERVAL:
+        _last_purge = now
+        expired = collection.get(
+            where={"$and": [{"expires_at": {"$gt": 0}}, {"expires_at": {"$lte": now}}]},
+            include=[],
+        )
+        _delete_facts(list(expired["ids"]))
+
+    if collection.count() > FACT_STORE_MAX:
+        data = collection.get(include=["metadatas"])
+        _delete_facts(select_evictions(list(data["ids"]), list(data["metadatas"])))
+
+
+def _upsert_facts(facts: list[str], metadatas: list[dict], embeddings: list[list[float]]):
+    now = time.time()
+    metadatas = [stamp_metadata(m, now) for m in metadatas]
+    ids = [fact_id(f) for f in facts]
+
+    # Bỏ bản gần trùng ngay trong batch, rồi so với các fact đã lưu
+    duplicates = set(find_duplicates(list(range(len(ids))), metadatas, embeddings))
+    keep = [i for i in range(len(ids)) if i not in duplicates]
+    facts, metadatas, embeddings = [facts[i] for i in keep], [metadatas[i] for i in keep], [embeddings[i] for i in keep]
+    ids = _dedupe_ids([ids[i] for i in keep], metadatas, embeddings)
+
+    # Cùng một id xuất hiện nhiều lần trong batch thì giữ bản cuối
+    rows = {doc_id: (f, m, e) for doc_id, f, m, e in zip(ids, facts, metadatas, embeddings)}
+    get_facts_collection().upsert(
+        ids=list(rows),
+        documents=[r[0] for r in rows.values()],
+        metadatas=[r[1] for r in rows.values()],
+        embeddings=[r[2] for r in rows.values()],
     )
+    if FACT_INDEX_BACKEND == "numpy":
+        index = get_fact_index()
+        index.upsert(
+            list(rows),
+            [r[0] for r in rows.values()],
+            [r[1] for r in rows.values()],
+            [r[2] for r in rows.values()],
+        )
+        index.save()
+    _bump_fact_version(r[1]["category"] for r in rows.values())
+    _enforce_lifecycle()
 
-    docs = [doc for sublist in results["documents"] for doc in sublist]
-    return docs
+
+def _search_facts(query_embeddings: list[list[float]], k: int, where_filter: dict | None) -> list[list[str]]:
+    now = time.time()
+    # Lấy dư để bù cho fact hết hạn chưa kịp dọn
+    rows_per_query = _search_rows(query_embeddings, k * 2, where_filter)
+
+    results = []
+    touched = {}
+    for rows in rows_per_query:
+        alive = [row for row in rows if not is_expired(row["metadata"], now)][:k]
+        for row in alive:
+            if needs_touch(row["metadata"], now):
+                touched[row["id"]] = {**row["metadata"], "last_access": now}
+        results.append([row["document"] for row in alive])
+
+    if touched:
+        _update_metadata(touched)
+    return results
+
+
+def add_user_fact(fact: str, category: str = "general", name: str = None, fact_type: str = None):
+    """Save a fact with optional metadata (name, type, category)."""
+    embedding = embed_texts_sync([fact])[0]
+    _upsert_facts([fact], [_fact_metadata(category, name, fact_type)], [embedding])
+
+
+def query_user_facts(query: str, k=3, category: str = None, name: str = None, fact_type: str = None):
+    """Query facts using both metadata filter and semantic similarity."""
+    query_embedding = embed_texts_sync([query])[0]
+    return _search_facts([query_embedding], k, _where_filter(category, name, fact_type))[0]
+
+
+def add_user_facts(facts: list[dict]):
+    """
+    Save many facts with one encoder pass and one Chroma upsert.
+
+    Each item: {"fact": str, "category": str, "name": str | None, "fact_type": str | None}
+    """
+    if not facts:
+        return
+    texts = [f["fact"] for f in facts]
+    metadatas = [
+        _fact_metadata(f.get("category") or "general", f.get("name"), f.get("fact_type"))
+        for f in facts
+    ]
+    _upsert_facts(texts, metadatas, embed_texts_sync(texts))
+
+
+def query_user_facts_many(queries: list[str], k=3, category: str = None, name: str = None, fact_type: str = None) -> list[list[str]]:
+    """Query several facts at once, returns one result list per query."""
+    if not queries:
+        return []
+    query_embeddings = embed_texts_sync(queries)
+    return _search_facts(query_embeddings, k, _where_filter(category, name, fact_type))
+
+
+async def aadd_user_fact(fact: str, category: str = "general", name: str = None, fact_type: str = None):
+    """Async add_user_fact: encode qua worker, ghi Chroma trong thread pool."""
+    embedding = (await embed_texts([fact]))[0]
+    await asyncio.to_thread(_upsert_facts, [fact], [_fact_metadata(category, name, fact_type)], [embedding])
+
+
+async def aquery_user_facts(query: str, k=3, category: str = None, name: str = None, fact_type: str = None):
+    """Async query_user_facts, không chặn event loop."""
+    query_embedding = (await embed_texts([query]))[0]
+    results = await asyncio.to_thread(
+        _search_facts, [query_embedding], k, _where_filter(category, name, fact_type)
+    )
+    return results[0]
+
+
+async def aadd_user_facts(facts: list[dict]):
+    if not facts:
+        return
+    texts = [f["fact"] for f in facts]
+    metadatas = [
+        _fact_metadata(f.get("category") or "general", f.get("name"), f.get("fact_type"))
+        for f in facts
+    ]
+    embeddings = await embed_texts(texts)
+    await asyncio.to_thread(_upsert_facts, texts, metadatas, embeddings)
+
+
+async def aquery_user_facts_many(queries: list[str], k=3, category: str = None, name: str = None, fact_type: str = None) -> list[list[str]]:
+    if not queries:
+        return []
+    query_embeddings = await embed_texts(queries)
+    return await asyncio.to_thread(
+        _search_facts, query_embeddings, k, _where_filter(category, name, fact_type)
+    )
 
 
 @tool
@@ -66,7 +409,7 @@ async def update_user_fact(fact: str, category: str = "general", name: str = Non
     Returns:
         Confirmation message that the fact was saved.
     """
-    add_user_fact(fact, category, name, fact_type)
+    await aadd_user_fact(fact, category, name, fact_type)
     return f"Fact saved under category '{category}'."
 
 
@@ -88,4 +431,54 @@ async def query_user_fact(query: str, category: str = None, name: str = None, fa
     Returns:
         List of up to 3 facts matching the query and filters.
     """
-    return query_user_facts(query, category=category, name=name, fact_type=fact_type)
+    return await aquery_user_facts(query, category=category, name=name, fact_type=fact_type)
+
+
+class UserFactInput(BaseModel):
+    fact: str = Field(description="The content of the fact to store.")
+    category: str = Field(default="general", description="One of: profile, preference, goal, conversation, general")
+    name: str | None = Field(default=None, description="(optional) A subject/entity name related to the fact")
+    fact_type: str | None = Field(default=None, description="(optional) Type of fact (e.g., email, phone, address)")
+
+
+@tool
+async def update_user_facts(facts: list[UserFactInput]) -> str:
+    """
+    Store several facts about the user in one call.
+
+    Prefer this over calling `update_user_fact` repeatedly, e.g. when the user
+    shares a profile, a list of preferences or several goals at once.
+
+    Args:
+        facts: The facts to store. Each item has `fact`, `category`
+            (profile, preference, goal, conversation, general) and optional
+            `name` and `fact_type`, with the same meaning as in `update_user_fact`.
+
+    Returns:
+        Confirmation message with the number of facts saved.
+    """
+    await aadd_user_facts([
+        f.model_dump() if isinstance(f, BaseModel) else dict(f) for f in facts
+    ])
+    return f"Saved {len(facts)} facts."
+
+
+@tool
+async def query_user_fact_many(queries: list[str], category: str = None, name: str = None, fact_type: str = None) -> dict[str, list[str]]:
+    """
+    Retrieve user facts for several queries in one call.
+
+    Use this when answering needs different kinds of facts at once
+    (e.g. preferences + profile + goals) instead of calling `query_user_fact` repeatedly.
+
+    Args:
+        queries: Semantic queries about user facts
+        category: (optional) Filter by category, applied to every query
+        name: (optional) Filter by subject/entity name
+        fact_type: (optional) Filter by fact type
+
+    Returns:
+        Mapping from each query to up to 3 matching facts.
+    """
+    results = await aquery_user_facts_many(queries, category=category, name=name, fact_type=fact_type)
+    return dict(zip(queries, results))
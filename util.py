@@ -1,11 +1,18 @@
 import json
+import os
+import re
 import yaml
 from pathlib import Path
 from typing import Any, Dict
 AgentState = Dict[str, Any] 
-from langchain_core.messages import messages_to_dict, messages_from_dict, SystemMessage
+from stateStore import JournaledStateStore
 
 STATE_FILE = "agent_state.json"
+# State của các session khác "default" (gateway) nằm ở <SESSIONS_DIR>/<session_id>.json
+SESSIONS_DIR = Path(os.getenv("SESSIONS_DIR", "sessions"))
+DEFAULT_SESSION_ID = "default"
+_state_stores: dict[str, JournaledStateStore] = {DEFAULT_SESSION_ID: JournaledStateStore(STATE_FILE)}
+_SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
 
 def load_yaml(path: Path):
     if not path.exists():
@@ -27,28 +34,27 @@ def load_short_term_memory(SHORT_TERM_MEMORY_PATH) -> str:
 def save_short_term_memory(content: str, SHORT_TERM_MEMORY_PATH):
     SHORT_TERM_MEMORY_PATH.write_text(content, encoding="utf-8")
 
-def save_state(state: AgentState):
-    serializable_state = state.copy()
+def state_store(session_id: str = DEFAULT_SESSION_ID) -> JournaledStateStore:
+    """Store riêng của từng session, tạo ở lần dùng đầu tiên."""
+    store = _state_stores.get(session_id)
+    if store is None:
+        if not _SESSION_ID_PATTERN.match(session_id) or session_id.strip(".") == "":
+            raise ValueError(f"Invalid session id '{session_id}'")
+        SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
+        store = _state_stores[session_id] = JournaledStateStore(SESSIONS_DIR / f"{session_id}.json")
+    return store
+
+def release_state_store(session_id: str):
+    """Bỏ store của session khỏi bộ nhớ (dữ liệu trên đĩa giữ nguyên)."""
+    if session_id != DEFAULT_SESSION_ID:
+        _state_stores.pop(session_id, None)
 
-    # convert messages
-    serializable_state["messages"] = messages_to_dict(state["messages"])
-    
-    if "system_prompt" in serializable_state:
-        serializable_state.pop("system_prompt")
+def save_state(state: AgentState):
+    state_store(state.get("session_id", DEFAULT_SESSION_ID)).save(state)
 
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(serializable_state, f, ensure_ascii=False, indent=2)
+def save_state_fields(session_id: str, fields: Dict[str, Any]):
+    state_store(session_id).save_fields(fields)
 
 
 def load_state(initial_state: AgentState) -> AgentState:
-    path = Path(STATE_FILE)
-    if path.exists() and path.stat().st_size > 0:
-        with open(path, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-
-            if "messages" in raw:
-                raw["messages"] = messages_from_dict(raw["messages"])
-
-            # merge vào initial_state để vẫn có system_prompt
-            return {**raw, "system_prompt": initial_state["system_prompt"]}
-    return initial_state
+    return state_store(initial_state.get("session_id", DEFAULT_SESSION_ID)).load(initial_state)